@@ -2,18 +2,39 @@
 
 """Handles JWT operations including encoding, decoding, and authentication."""
 
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 
+from auth.revocation import denylist
+from cachetools import TLRUCache
 from config.logging import logger
 from config.settings import settings
-from database.connection import ConType, DBCon, SessionData, pools, session_vars
+from database.connection import (
+    AUTH_ERRORS,
+    AUTH_POOL,
+    ConType,
+    DBCon,
+    SessionData,
+    pools,
+    session_vars,
+)
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, JWTError, jwt
+from utils.metrics import metrics
 
 oauth_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
+verified_tokens = TLRUCache(
+    maxsize=settings.jwt.cache_size,
+    ttu=lambda key, payload, now: payload["exp"],
+    timer=time.time,
+)
+"""Payloads of verified tokens by digest and type, each dropped at its `exp`."""
+
 
 class JWTType(Enum):
     """Enumeration for JWT token types."""
@@ -39,8 +60,22 @@ def validate_jwt_type(payload: dict, jwt_type: JWTType):
 # Параметры функции decode_token: token извлекается через Depends, а jwt_type имеет значение по умолчанию (AT).
 async def decode_token(token=Depends(oauth_scheme), jwt_type: JWTType = JWTType.AT):
     try:
-        payload = jwt.decode(token, settings.jwt.key, algorithms=f"{settings.jwt.alg}")
-        validate_jwt_type(payload, jwt_type)
+        key = (hashlib.sha256(token.encode()).digest(), jwt_type)
+        if (payload := verified_tokens.get(key)) is not None:
+            # Токен уже проверен, пропускаем криптографию
+            metrics.inc("cache_hits_total", cache="verified_tokens")
+            payload = dict(payload)
+        else:
+            metrics.inc("cache_misses_total", cache="verified_tokens")
+            payload = jwt.decode(
+                token, settings.jwt.key, algorithms=f"{settings.jwt.alg}"
+            )
+            validate_jwt_type(payload, jwt_type)
+            verified_tokens[key] = dict(payload)
+
+        if payload.get("jti") in denylist:
+            verified_tokens.pop(key, None)
+            raise HTTPException(401, "Token has been revoked")
 
         # Обновляем сессионные переменные
         session_vars.set(
@@ -76,6 +111,9 @@ async def encode_token(
         elif isinstance(session_data, dict):
             token_data.update(session_data)
 
+    # Новый идентификатор даже при обновлении из старого payload
+    token_data["jti"] = uuid.uuid4().hex
+
     return jwt.encode(token_data, settings.jwt.key, algorithm=f"{settings.jwt.alg}")
 
 
@@ -86,20 +124,40 @@ async def authenticate(uname: str, pword: str, guest=False):
             return {"position": f"{uname}"}
 
         # Для бизнес-пользователей и работников
-        async with DBCon.connect(
-            settings.database.get_role(), ConType.SIMPLE, uname, pword
-        ) as conn:
+        await pools.get_auth_pool()
+        async with pools.checkout(AUTH_POOL) as conn:
             session_data = await conn.fetchrow(
                 "SELECT * FROM shared.account_authorize($1, $2)", uname, pword
             )
 
-            if session_data is None:
-                raise HTTPException(403, "Authentication Failed")
+        if session_data is None:
+            raise HTTPException(403, "Authentication Failed")
 
-            await pools.get_pool(session_data["position"], uname, pword)
+    except Exception as e:
+        logger.error(f"Authentication failed for user: {uname}, error: {e}")
+        raise HTTPException(403, "Authentication Failed")
+
+    # Пул пользователя откроется при первом запросе, а не при входе
+    position = session_data["position"]
+    if (
+        settings.database.pool_mode != "shared"
+        and position not in pools.creds
+        and not settings.database.get_role(position)
+    ):
+        await register_login(position, uname, pword)
+
+    return session_data
 
-            return session_data
 
+async def register_login(position: str, uname: str, pword: str):
+    """Register the pool credentials of a position once the server accepts them."""
+    # Неверный пароль не должен сломать пул позиции для всех её пользователей
+    try:
+        async with DBCon.connect(position, ConType.SIMPLE, uname, pword):
+            pass
+    except AUTH_ERRORS as e:
+        raise HTTPException(401, "Invalid credentials") from e
     except Exception as e:
-        logger.error(f"Authentication failed for user: {uname}, error: {e}")
+        logger.error(f"Login check failed for user: {uname}, error: {e}")
         raise HTTPException(403, "Authentication Failed")
+    pools.register(position, uname, pword)
@@ -0,0 +1,141 @@
+# backend/auth/revocation.py
+
+"""Keeps an in-process denylist of revoked tokens in sync with the database."""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from config.logging import logger
+from config.settings import settings
+from database.connection import DBCon
+from database.execution import QueryMode, execute
+from database.notify import listener
+
+REVOCATION_ROLE = "endpoint"
+"""Role recording and reading revocations."""
+
+PRUNE_INTERVAL = 60
+"""Seconds between drops of expired ids from the denylist."""
+
+REVOCATION_DDL = """
+CREATE TABLE IF NOT EXISTS shared.revoked_token (
+    jti TEXT PRIMARY KEY,
+    exp TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE OR REPLACE FUNCTION shared.notify_token_revoked() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('token_revoked',
+        NEW.jti || ' ' || extract(epoch FROM NEW.exp)::bigint);
+    RETURN NULL;
+END;
+$$;
+DROP TRIGGER IF EXISTS token_revoked ON shared.revoked_token;
+CREATE TRIGGER token_revoked AFTER INSERT ON shared.revoked_token
+    FOR EACH ROW EXECUTE FUNCTION shared.notify_token_revoked();
+GRANT USAGE ON SCHEMA shared TO {role};
+GRANT SELECT, INSERT, DELETE ON shared.revoked_token TO {role};
+"""
+"""Revocation table announcing every insert on token_revoked as 'jti exp'."""
+
+
+class Denylist:
+    """Revoked token ids with their expiry, checked without a database trip."""
+
+    def __init__(self):
+        self.revoked: Dict[str, float] = {}
+        self._pruner: Optional[asyncio.Task] = None
+
+    def __contains__(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self.revoked
+
+    def add(self, jti: str, exp: float):
+        """Deny a token id until its expiry."""
+        self.revoked[jti] = exp
+
+    def prune(self):
+        """Drop ids past their expiry, the tokens are rejected as expired anyway."""
+        now = time.time()
+        for jti in [k for k, v in self.revoked.items() if v <= now]:
+            del self.revoked[jti]
+
+    async def _prune_forever(self):
+        """Periodically prune expired ids."""
+        while True:
+            await asyncio.sleep(PRUNE_INTERVAL)
+            self.prune()
+
+    def start_pruner(self):
+        """Start pruning expired ids in the background."""
+        if self._pruner is None:
+            self._pruner = asyncio.create_task(self._prune_forever())
+
+    def stop_pruner(self):
+        """Stop the background pruning."""
+        if self._pruner:
+            self._pruner.cancel()
+            self._pruner = None
+
+    async def load(self):
+        """Replace the denylist with the unexpired revocations in the database."""
+        await execute(
+            "DELETE FROM shared.revoked_token WHERE exp < now()",
+            REVOCATION_ROLE,
+            QueryMode.EXECUTE,
+        )
+        rows = await execute(
+            """SELECT jti, extract(epoch FROM exp)::float AS exp
+            FROM shared.revoked_token""",
+            REVOCATION_ROLE,
+            QueryMode.FETCH_ALL,
+        )
+        self.revoked = {row["jti"]: row["exp"] for row in rows}
+        logger.info(f"Loaded {len(self.revoked)} revoked tokens")
+
+    def on_notify(self, payload: Optional[str]):
+        """Apply a revocation from another worker, or reload after reconnect."""
+        if payload is None:
+            # Revocations may have been missed while disconnected
+            asyncio.create_task(self.reload())
+            return
+        jti, _, exp = payload.partition(" ")
+        self.add(jti, float(exp))
+
+    async def reload(self):
+        """Load the denylist in the background, keeping it on failure."""
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Failed to reload revoked tokens: {e}")
+
+
+denylist = Denylist()
+"""Shared denylist of revoked token ids."""
+listener.subscribe("token_revoked", denylist.on_notify)
+
+
+async def revoke(jti: str, exp: float):
+    """Record a revocation, effective in this worker at once and others on notify."""
+    denylist.add(jti, exp)
+    await execute(
+        """INSERT INTO shared.revoked_token (jti, exp) VALUES ($1, to_timestamp($2))
+        ON CONFLICT (jti) DO NOTHING""",
+        REVOCATION_ROLE,
+        QueryMode.EXECUTE,
+        (jti, exp),
+    )
+
+
+async def watch_revocations():
+    """Install the revocation table and load the current denylist."""
+    role = settings.database.get_role(REVOCATION_ROLE)
+    try:
+        await DBCon.install(
+            REVOCATION_DDL.format(role=role.uname), "Token revocation table"
+        )
+        await denylist.load()
+    except Exception as e:
+        logger.error(f"Token revocations unavailable: {e}")
+    denylist.start_pruner()
@@ -2,8 +2,14 @@
 
 """Configuration for application logging."""
 
+import atexit
+import copy
 import logging
 import logging.config
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
 
 from config.settings import settings
 from rich.logging import RichHandler
@@ -57,8 +63,79 @@ log_cfg = {
     },
 }
 
+
+class LogQueueHandler(QueueHandler):
+    """Queue handler that defers all formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in-process, so args and exc_info need no pickling and
+        # Rich can still render tracebacks on the other side
+        return copy.copy(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes a random sample of records, capped at a number per second."""
+
+    def __init__(self, rate: float = 1.0, per_second: int = 0):
+        super().__init__()
+        self.rate = rate
+        self.per_second = per_second
+        self._window = 0
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return False
+        if self.per_second:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window, self._count = window, 0
+            self._count += 1
+            return self._count <= self.per_second
+        return True
+
+
+log_listeners = []
+"""Background listeners draining the logging queues."""
+
+
+def enqueue_handlers(*names: str):
+    """Move the handlers of the given loggers behind a queue and a listener thread."""
+    for name in names:
+        target = logging.getLogger(name)
+        if not target.handlers:
+            continue
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(
+            log_queue, *target.handlers, respect_handler_level=True
+        )
+        target.handlers = [LogQueueHandler(log_queue)]
+        listener.start()
+        log_listeners.append(listener)
+
+
+@atexit.register
+def stop_log_listeners():
+    """Flush and stop the logging listener threads."""
+    while log_listeners:
+        log_listeners.pop().stop()
+
+
 # Apply the logging configuration
 logging.config.dictConfig(log_cfg)
 logging.getLogger("uvicorn.access").handlers = []
+if settings.logging.use_queue:
+    enqueue_handlers("root", "uvicorn")
 logger = logging.getLogger(__name__)
 """Logger instance for the logging module."""
+query_logger = logging.getLogger("queries")
+"""Logger for per-query records, sampled to keep bulk traffic cheap."""
+query_logger.addFilter(
+    SamplingFilter(
+        settings.logging.query_sample_rate, settings.logging.query_rate_limit
+    )
+)
+slow_query_logger = logging.getLogger("slow_queries")
+"""Logger for queries over the slow threshold, never sampled."""
@@ -5,7 +5,7 @@
 import os
 from pathlib import Path
 from secrets import token_hex
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings
@@ -24,6 +24,26 @@ class DBSettings(BaseSettings):
 
     pool_min_size: int = 1
     pool_max_size: int = 15
+    pool_budget: int = 90  # Connections across all pools (0 = unbounded)
+    pool_idle_timeout: int = 600  # Seconds before an unused pool is closed (0 = never)
+    # Seconds an idle connection is kept (asyncpg: 300), pre-warmed pools keep theirs
+    pool_conn_lifetime: float = 60
+    auth_pool_size: int = 3  # Connections of the default role reserved for logins
+    prewarm_roles: List[str] = ["endpoint", "customer"]  # Pools opened at startup
+    prewarm_size: int = 5  # Connections opened in each pre-warmed pool
+    export_prefetch: int = 1000  # Rows fetched per cursor round trip on export
+    copy_threshold: int = 500  # Bulk inserts above this many records use COPY
+    copy_chunk_size: int = 10000  # Records sent per COPY into the staging table
+    # "table" keeps the temp app_session table, "guc" uses set_config per transaction
+    session_mode: Literal["table", "guc"] = "table"
+    # "role" opens a pool per role, "shared" multiplexes roles over one pool via SET ROLE
+    pool_mode: Literal["role", "shared"] = "role"
+    # Login of the shared pool, required in shared mode: a dedicated NOINHERIT role
+    # granted every role it switches to, with a password unless it is a default role
+    shared_pool_login: Optional[str] = None
+    shared_pool_password: Optional[str] = None
+    notify_role: str = "endpoint"  # Role of the LISTEN connection
+    meta_cache_ttl: int = 30  # Fallback metadata TTL when LISTEN is unavailable
     db_host: str = "localhost"
     db_port: int = 1618
     db_base: str = "cleaners"
@@ -36,6 +56,12 @@ class DBSettings(BaseSettings):
         env_file = ".env"
         env_prefix = "DB_"
 
+    @property
+    def guc_session(self) -> bool:
+        """Whether session context is bound through transaction-local settings."""
+        # Temp tables are owned by one role, so a shared pool needs GUCs
+        return self.session_mode == "guc" or self.pool_mode == "shared"
+
     def get_role(self, role_name: Optional[str] = None) -> Optional[Role]:
         """Retrieve the Role object for a given role name."""
         return self.default_roles.get(role_name or "customer")
@@ -56,6 +82,17 @@ class DBSettings(BaseSettings):
         }
         return values
 
+    @model_validator(mode="after")
+    def check_shared_pool(cls, values):
+        """Require an explicit login for the shared pool."""
+        if values.pool_mode == "shared":
+            login = values.shared_pool_login
+            if not login:
+                raise ValueError("DB_SHARED_POOL_LOGIN is required in shared pool mode")
+            if login not in values.default_roles and not values.shared_pool_password:
+                raise ValueError(f"DB_SHARED_POOL_PASSWORD is required for {login}")
+        return values
+
 
 class CORSSettings(BaseSettings):
     """Settings related to Cross-Origin Resource Sharing (CORS)."""
@@ -87,6 +124,7 @@ class JWTSettings(BaseSettings):
     key: str = Field(default_factory=lambda: token_hex(32))
     at_exp: int = 1800  # Access token expiration time in seconds
     rt_exp: int = 180000  # Refresh token expiration time in seconds
+    cache_size: int = 4096  # Verified tokens kept to skip repeated verification
 
     class Config:
         env_prefix = "JWT_"
@@ -116,6 +154,13 @@ class LoggingSettings(BaseSettings):
     prod_console_class: str = "logging.StreamHandler"
     prod_console_formatter: str = "default"
     prod_console_stream: str = "ext://sys.stdout"
+    # Handlers run on a background thread behind a queue
+    use_queue: bool = True
+    # Share of per-query log records kept and their cap per second (0 = no cap)
+    query_sample_rate: float = 1.0
+    query_rate_limit: int = 0
+    # Queries taking longer than this go to the slow-query log (0 = off)
+    slow_query_ms: int = 500
 
     class Config:
         env_prefix = "LOG_"
@@ -5,16 +5,21 @@
 import asyncio
 import contextvars
 import re
+import time
 from abc import ABC
-from contextlib import asynccontextmanager
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext, suppress
 from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple
 
 import asyncpg
 from asyncpg import Connection, create_pool
 from config.logging import logger
 from config.settings import settings
+from database.errors import to_http_error
 from fastapi import HTTPException
 from pydantic import BaseModel
+from utils.metrics import metrics, timed
 
 
 class SessionData(BaseModel):
@@ -47,8 +52,18 @@ def url(uname=None, pword=None, host=None, port=None, base=None):
     return f"postgresql://{uname}:{pword}@{host}:{port}/{base}"
 
 
+AUTH_POOL = "auth"
+"""Registry key of the pool running logins."""
+
+AUTH_ERRORS = (
+    asyncpg.exceptions.InvalidPasswordError,
+    asyncpg.exceptions.InvalidAuthorizationSpecificationError,
+)
+"""Errors of a login rejected by the server."""
+
+
 class PGPool(ABC):
-    """Manages PostgreSQL connection pools."""
+    """Manages PostgreSQL connection pools within a global connection budget."""
 
     def __contains__(self, pool):
         return pool in self.pools
@@ -57,52 +72,298 @@ class PGPool(ABC):
         return self.pools[key]
 
     def __init__(self):
-        self.pools = {}
-        self._lock = asyncio.Lock()
+        self.pools: "OrderedDict[str, asyncpg.Pool]" = OrderedDict()  # LRU first
+        self.creds: Dict[str, Tuple[str, str]] = {}
+        self.sizes: Dict[str, int] = {}  # Pool sizes overriding pool_max_size
+        self.last_used: Dict[str, float] = {}
+        self.reserved = 0  # Connections promised to pools, existing or pending
+        self.claims: Dict[str, int] = {}  # Connections promised to each pool
+        self.lent: Dict[str, int] = {}  # Connections handed out against claims
+        self.held: Dict[str, int] = {}  # Callers using a pool, pinning it
+        self.warm: Set[str] = set()  # Pre-warmed pools, kept open and warm
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._returns: Dict[str, asyncio.Condition] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _touch(self, role: str):
+        """Mark a pool as most recently used."""
+        self.pools.move_to_end(role)
+        self.last_used[role] = time.monotonic()
+
+    def _evictable(self, role: str, pool) -> bool:
+        """Only idle pools other than logins, default and pre-warmed may be closed."""
+        in_use = pool.get_size() - pool.get_idle_size()
+        pinned = (
+            role == AUTH_POOL
+            or role in settings.database.default_roles
+            or role in self.warm
+        )
+        return not pinned and not self.held.get(role) and in_use == 0
+
+    def register(self, role: str, uname: str, pword: str, max_size: int = None):
+        """Remember credentials of a role, its pool is opened on first use.
+
+        Credentials already known for the role are kept, so another login can
+        not replace the ones its pool works with.
+        """
+        self.creds.setdefault(role, (uname, pword))
+        if max_size:
+            self.sizes[role] = max_size
+
+    async def get_auth_pool(self):
+        """Return the small pool of the default role reserved for logins."""
+        if AUTH_POOL not in self.creds:
+            role = settings.database.get_role()
+            self.register(
+                AUTH_POOL, role.uname, role.pword, settings.database.auth_pool_size
+            )
+        return await self.get_pool(AUTH_POOL)
+
+    async def get_shared_pool(self):
+        """Return the pool all roles are switched over in shared pool mode."""
+        login = settings.database.shared_pool_login
+        return await self.get_pool(login, login, settings.database.shared_pool_password)
+
+    async def _reserve(self, size: int, keep: str = None):
+        """Claim budget for connections, evicting least recently used idle pools."""
+        budget = settings.database.pool_budget
+        while budget and self.reserved + size > budget:
+            victim = next(
+                (
+                    r
+                    for r, p in self.pools.items()
+                    if r != keep and self._evictable(r, p)
+                ),
+                None,
+            )
+            if victim is None:
+                raise HTTPException(503, "Database connection budget exhausted")
+            metrics.inc("db_pool_evictions_total", reason="budget")
+            await self.close_pool(victim)
+        self.reserved += size
 
     async def init_pool(self, role: str, uname: str = None, pword: str = None):
         if role in self.pools:
             return self.pools[role]
-        async with self._lock:
+        # Per-role lock, so a slow connect does not stall other roles
+        async with self._locks.setdefault(role, asyncio.Lock()):
             if role not in self.pools:
                 role_creds = settings.database.get_role(role)
                 if role_creds:
                     uname = uname or role_creds.uname
                     pword = pword or role_creds.pword
+                elif uname and pword:
+                    self.creds[role] = (uname, pword)
+                elif role in self.creds:
+                    # Re-create an evicted pool with the credentials it was opened with
+                    uname, pword = self.creds[role]
                 else:
-                    if not uname or not pword:
-                        raise HTTPException(
-                            400, "Username and password are required for new pool"
-                        )
+                    raise HTTPException(
+                        400, "Username and password are required for new pool"
+                    )
                 dsn = url(uname, pword)
+                max_size = self.sizes.get(role, settings.database.pool_max_size)
+                min_size = min(settings.database.pool_min_size, max_size)
+                lifetime = settings.database.pool_conn_lifetime
+                if role in self.warm:
+                    # asyncpg закрыл бы по простою и прогретые соединения,
+                    # 0 отключает таймаут для пулов, прогретых при старте
+                    lifetime = 0
+                # Only the connections opened up front, the rest is claimed by grow()
+                await self._reserve(min_size)
                 try:
                     self.pools[role] = await create_pool(
                         dsn,
-                        min_size=settings.database.pool_min_size,
-                        max_size=settings.database.pool_max_size,
+                        min_size=min_size,
+                        max_size=max_size,
+                        max_inactive_connection_lifetime=lifetime,
                         timeout=30,
                     )
+                    self.claims[role] = min_size
                     logger.info(f"Created pool for role {role}")
                 except Exception as e:
+                    self.reserved -= min_size
                     logger.error(f"Failed to create pool for role {role}: {e}")
-                    raise HTTPException(500, f"Failed to create pool: {e}") from e
+                    if isinstance(e, AUTH_ERRORS):
+                        # Забываем отвергнутые данные, следующий вход задаст новые
+                        if not role_creds:
+                            self.creds.pop(role, None)
+                        raise HTTPException(401, "Invalid database credentials") from e
+                    raise HTTPException(500, "Failed to create pool") from e
+            self._touch(role)
             return self.pools[role]
 
     async def get_pool(self, role: str, uname: str = None, pword: str = None):
         if not role:
             raise ValueError("Role is required")
         try:
-            return self.pools[role]
+            pool = self.pools[role]
         except KeyError:
             return await self.init_pool(role, uname, pword)
+        self._touch(role)
+        return pool
+
+    @asynccontextmanager
+    async def checkout(
+        self, role: str, uname: str = None, pword: str = None, label: str = None
+    ):
+        """Lend a connection of a role's pool, claiming budget before it opens."""
+        pool = await self.get_pool(role, uname, pword)
+        # Сразу после get_pool, без await: пул не вытеснят, пока он в работе
+        self.held[role] = self.held.get(role, 0) + 1
+        try:
+            await self._lend(role, pool)
+            try:
+                waiting = time.perf_counter()
+                conn = await pool.acquire()
+                metrics.observe(
+                    "db_pool_acquire_seconds",
+                    time.perf_counter() - waiting,
+                    role=label or role,
+                )
+                try:
+                    yield conn
+                finally:
+                    await pool.release(conn)
+            finally:
+                await self._give_back(role)
+        finally:
+            self._unhold(role)
+
+    async def _lend(self, role: str, pool):
+        """Wait until claimed budget covers one more connection handed out.
+
+        Every caller past this point is counted in `lent` before it acquires,
+        so concurrent callers can not open connections nobody has claimed.
+        """
+        returns = self._returns.setdefault(role, asyncio.Condition())
+        async with returns:
+            while True:
+                claims = self.claims.get(role, 0)
+                if self.lent.get(role, 0) < claims or claims >= pool.get_max_size():
+                    # A claimed connection is free, or the pool queues at max_size
+                    break
+                try:
+                    await self._reserve(1, keep=role)
+                except HTTPException:
+                    if not self.lent.get(role):
+                        raise
+                    # Бюджет исчерпан: ждём возврата соединения этого пула
+                    await returns.wait()
+                    continue
+                self.claims[role] = self.claims.get(role, 0) + 1
+                break
+            self.lent[role] = self.lent.get(role, 0) + 1
+
+    async def _give_back(self, role: str):
+        """Return a lent connection and wake one caller waiting for it."""
+        returns = self._returns.setdefault(role, asyncio.Condition())
+        async with returns:
+            self.lent[role] = self.lent.get(role, 0) - 1
+            returns.notify()
+
+    def _unhold(self, role: str):
+        """Drop one caller of a pool, unpinning it after the last one."""
+        left = self.held.get(role, 0) - 1
+        if left > 0:
+            self.held[role] = left
+        else:
+            self.held.pop(role, None)
+
+    def shrink(self, role: str, pool):
+        """Return budget of connections the pool has closed since they were claimed."""
+        floor = max(
+            pool.get_size(),
+            self.lent.get(role, 0),
+            min(settings.database.pool_min_size, pool.get_max_size()),
+        )
+        surplus = self.claims.get(role, 0) - floor
+        if surplus > 0:
+            self.claims[role] -= surplus
+            self.reserved -= surplus
 
     async def close_pool(self, role: str):
         pool = self.pools.pop(role, None)
+        self.last_used.pop(role, None)
+        lock = self._locks.get(role)
+        if lock is not None and not lock.locked():
+            del self._locks[role]
+        if not self.held.get(role):
+            self._returns.pop(role, None)
+            self.lent.pop(role, None)
         if pool:
+            self.reserved -= self.claims.pop(role, 0)
             await pool.close()
             logger.info(f"Closed pool for role {role}")
 
+    async def prewarm(self, roles: List[str], size: int):
+        """Open pools of the given roles with up to `size` live connections."""
+        shared = settings.database.pool_mode == "shared"
+        if shared:
+            roles = [settings.database.shared_pool_login]
+        # До создания пулов: init_pool отключает им таймаут простоя
+        self.warm.update(roles)
+        if shared:
+            await self.get_shared_pool()
+        for role in roles:
+            pool = await self.get_pool(role)
+            # Holding connections at once forces the pool to open that many
+            count = min(size, pool.get_max_size())
+            async with AsyncExitStack() as stack:
+                conns = await asyncio.gather(
+                    *(
+                        stack.enter_async_context(self.checkout(role))
+                        for _ in range(count)
+                    ),
+                    return_exceptions=True,
+                )
+            failed = [c for c in conns if isinstance(c, BaseException)]
+            if failed:
+                raise failed[0]
+            logger.info(f"Pre-warmed pool for role {role} with {count} connections")
+
+    async def sweep(self):
+        """Close idle pools not used within the idle timeout, shrink the rest."""
+        timeout = settings.database.pool_idle_timeout
+        now = time.monotonic()
+        for role, pool in list(self.pools.items()):
+            idle_for = now - self.last_used.get(role, now)
+            if idle_for > timeout and self._evictable(role, pool):
+                metrics.inc("db_pool_evictions_total", reason="idle")
+                await self.close_pool(role)
+            else:
+                self.shrink(role, pool)
+
+    async def _sweep_forever(self):
+        """Periodically sweep idle pools."""
+        interval = max(settings.database.pool_idle_timeout / 2, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Pool sweep failed: {e}")
+
+    def start_sweeper(self):
+        """Start the idle pool sweeper if an idle timeout is configured."""
+        if settings.database.pool_idle_timeout and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    def collect(self):
+        """Sample size, in-use and idle connections of every pool."""
+        for role, pool in list(self.pools.items()):
+            size, idle = pool.get_size(), pool.get_idle_size()
+            labels = {"role": role}
+            yield "db_pool_size", labels, size
+            yield "db_pool_max_size", labels, pool.get_max_size()
+            yield "db_pool_idle", labels, idle
+            yield "db_pool_in_use", labels, size - idle
+            yield "db_pool_claimed", labels, self.claims.get(role, 0)
+
     async def close_all_pools(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
         for role in list(self.pools.keys()):
             try:
                 await self.close_pool(role)
@@ -111,6 +372,7 @@ class PGPool(ABC):
 
 
 pools = PGPool()
+metrics.register(pools.collect)
 
 
 class ConType(Enum):
@@ -121,9 +383,76 @@ class ConType(Enum):
     SESSION = "session"  # Connection with session context
 
 
+SESSION_VIEW_DDL = """
+CREATE OR REPLACE VIEW public.app_session AS
+SELECT current_setting('app.position', true) AS position,
+    nullif(current_setting('app.customer_id', true), '')::int AS customer_id,
+    nullif(current_setting('app.employee_id', true), '')::int AS employee_id,
+    nullif(current_setting('app.branch_id', true), '')::int AS branch_id;
+GRANT SELECT ON public.app_session TO PUBLIC;
+"""
+"""Compatibility view exposing session GUCs under the app_session name."""
+
+SET_SESSION_GUCS = """SELECT set_config('app.position', $1, true),
+    set_config('app.customer_id', $2, true),
+    set_config('app.employee_id', $3, true),
+    set_config('app.branch_id', $4, true)"""
+"""Binds the session context to the current transaction."""
+SET_ROLE_GUC = ", set_config('role', $1, true)"
+"""Equivalent of SET LOCAL ROLE that accepts the role as a parameter."""
+
+
 class DBCon:
     """Manages different types of database connections."""
 
+    @staticmethod
+    async def install(ddl: str, name: str):
+        """Run DDL once as the database administrator."""
+        admin = settings.database.get_role("postgres")
+        async with DBCon.connect(
+            admin.uname, ConType.SIMPLE, admin.uname, admin.pword
+        ) as conn:
+            await conn.execute(ddl)
+        logger.info(f"{name} is installed")
+
+    @staticmethod
+    async def install_session_view():
+        """Create the app_session view that reads transaction-local GUCs."""
+        await DBCon.install(SESSION_VIEW_DDL, "Session context view app_session")
+
+    @staticmethod
+    @asynccontextmanager
+    async def _session(conn: Connection, role: str):
+        """Bind session context to the connection for the duration of the block."""
+        if settings.database.guc_session:
+            vars = session_vars.get()
+            query = SET_SESSION_GUCS
+            if settings.database.pool_mode == "shared":
+                query += SET_ROLE_GUC
+            # Transaction-local settings vanish on commit, so nothing to clean up
+            async with conn.transaction():
+                await conn.execute(
+                    query,
+                    role,
+                    *(
+                        "" if vars.get(k) is None else str(vars.get(k))
+                        for k in ("customer_id", "employee_id", "branch_id")
+                    ),
+                )
+                yield
+        else:
+            await DBCon._setup_session(conn, role)
+            yield
+            await DBCon._cleanup_session(conn)
+
+    @staticmethod
+    @asynccontextmanager
+    async def _as_role(conn: Connection, role: str):
+        """Switch a shared pool connection to the role for one transaction."""
+        async with conn.transaction():
+            await conn.execute("SELECT set_config('role', $1, true)", role)
+            yield
+
     @staticmethod
     async def _setup_session(conn: Connection, role: str):
         """Setup session context."""
@@ -163,8 +492,16 @@ class DBCon:
         conn_type: ConType = ConType.SESSION,
         uname: str = None,
         pword: str = None,
+        phases: Optional[Dict[str, float]] = None,
+        reuse_scope: bool = True,
     ):
-        """Universal connection context manager."""
+        """Universal connection context manager.
+
+        When `phases` is given, time spent acquiring the connection and setting
+        up the session is added to it under "acquire" and "session". With
+        `reuse_scope` off a separate connection is used even inside a request
+        scope, e.g. for work outliving the request handler.
+        """
         if not role:
             raise ValueError("Role is required")
 
@@ -177,18 +514,117 @@ class DBCon:
             finally:
                 await conn.close()
         else:
-            # Для пулов используем либо переданные credentials, либо из сессии
-            pool = await pools.get_pool(role, uname, pword)
-            conn = await pool.acquire()
+            scope = request_scope.get()
+            if (
+                reuse_scope
+                and scope is not None
+                and scope.role == role
+                and conn_type == ConType.SESSION
+                and not uname
+            ):
+                # Reuse the connection already bound to the current request
+                try:
+                    async with scope.use(phases) as conn:
+                        yield conn
+                except Exception as e:
+                    DBCon._fail(e)
+            else:
+                async with DBCon._pooled(role, conn_type, uname, pword, phases) as conn:
+                    yield conn
+
+    @staticmethod
+    @asynccontextmanager
+    async def _pooled(
+        role: str,
+        conn_type: ConType,
+        uname: str = None,
+        pword: str = None,
+        phases: Optional[Dict[str, float]] = None,
+    ):
+        """Acquire a pooled connection, with session context if requested."""
+        phases = {} if phases is None else phases
+        shared = settings.database.pool_mode == "shared"
+        # Для пулов используем либо переданные credentials, либо из сессии
+        if shared:
+            login = settings.database.shared_pool_login
+            checkout = pools.checkout(
+                login, login, settings.database.shared_pool_password, label=role
+            )
+        else:
+            checkout = pools.checkout(role, uname, pword)
+        async with AsyncExitStack() as stack:
+            with timed(phases, "acquire"):
+                conn = await stack.enter_async_context(checkout)
             try:
                 if conn_type == ConType.SESSION:
-                    await DBCon._setup_session(conn, role)
-                yield conn
-                if conn_type == ConType.SESSION:
-                    await DBCon._cleanup_session(conn)
+                    session = DBCon._session(conn, role)
+                elif shared:
+                    session = DBCon._as_role(conn, role)
+                else:
+                    session = nullcontext()
+                async with AsyncExitStack() as session_stack:
+                    with timed(phases, "session"):
+                        await session_stack.enter_async_context(session)
+                    yield conn
             except Exception as e:
-                err_msg = f"Database connection failed: {str(e)}"
-                logger.error(err_msg)
-                raise HTTPException(status_code=500, detail=err_msg) from e
+                DBCon._fail(e)
+
+    @staticmethod
+    def _fail(e: Exception):
+        """Log a failed connection usage and convert it to an HTTP error."""
+        if isinstance(e, HTTPException):
+            raise e
+        logger.error(f"Database connection failed: {str(e)}")
+        # Текст ошибки PostgreSQL остаётся в логе, клиенту уходит только статус
+        raise to_http_error(e) from e
+
+    @staticmethod
+    @asynccontextmanager
+    async def scope(role: str):
+        """Bind one lazily acquired connection to every query in this context."""
+        scope = RequestScope(role)
+        token = request_scope.set(scope)
+        try:
+            yield scope
+        except BaseException as e:
+            # Roll back and release, but surface the request's own error
+            with suppress(Exception):
+                await scope.stack.__aexit__(type(e), e, e.__traceback__)
+            raise
+        else:
+            await scope.stack.aclose()
+        finally:
+            request_scope.reset(token)
+
+
+class RequestScope:
+    """Connection shared by all queries of one request, acquired on first use."""
+
+    def __init__(self, role: str):
+        self.role = role
+        self.conn: Connection | None = None
+        self.stack = AsyncExitStack()
+        self._lock = asyncio.Lock()
+        self._owner = None
+
+    @asynccontextmanager
+    async def use(self, phases: Optional[Dict[str, float]] = None):
+        """Borrow the scoped connection, serializing concurrent tasks."""
+        task = asyncio.current_task()
+        if self._owner is task:
+            # Nested usage from the task already holding the connection
+            yield self.conn
+            return
+        async with self._lock:
+            self._owner = task
+            try:
+                if self.conn is None:
+                    self.conn = await self.stack.enter_async_context(
+                        DBCon._pooled(self.role, ConType.SESSION, phases=phases)
+                    )
+                yield self.conn
             finally:
-                await pool.release(conn)
+                self._owner = None
+
+
+request_scope = contextvars.ContextVar("request_scope", default=None)
@@ -0,0 +1,42 @@
+# backend/database/errors.py
+
+"""Maps database errors to HTTP errors without leaking database messages."""
+
+from asyncpg.exceptions import (
+    CheckViolationError,
+    ForeignKeyViolationError,
+    NotNullViolationError,
+    UniqueViolationError,
+)
+from fastapi import HTTPException
+
+# Mapping of specific database exceptions to HTTP exceptions
+DB_ERROR_MAP = {
+    CheckViolationError: (400, "Check constraint violation"),
+    ForeignKeyViolationError: (409, "Foreign key violation"),
+    NotNullViolationError: (400, "Required field missing"),
+    UniqueViolationError: (409, "Duplicate record"),
+}
+
+
+def handle_db_error(e: Exception) -> None:
+    """Convert database exceptions to HTTP exceptions."""
+    for exc_type, (status_code, detail) in DB_ERROR_MAP.items():
+        if isinstance(e, exc_type):
+            # Convert known database errors into corresponding HTTP exceptions
+            raise HTTPException(status_code=status_code, detail=detail) from e
+    # If exception is not in the mapping, re-raise it
+    raise e
+
+
+def to_http_error(e: Exception) -> HTTPException:
+    """HTTP error for a failure, keeping HTTP errors and hiding database text."""
+    if isinstance(e, HTTPException):
+        return e
+    try:
+        handle_db_error(e)
+    except HTTPException as mapped:
+        return mapped
+    except Exception:
+        pass
+    return HTTPException(status_code=500, detail="Operation Failed")
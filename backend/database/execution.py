@@ -2,18 +2,18 @@
 
 """Executes database queries and handles related errors."""
 
+import re
 from enum import Enum
+from functools import lru_cache
+from time import perf_counter
 from typing import Any, Optional, Tuple
 
-from asyncpg.exceptions import (
-    CheckViolationError,
-    ForeignKeyViolationError,
-    NotNullViolationError,
-    UniqueViolationError,
-)
-from config.logging import logger
+from config.logging import logger, query_logger, slow_query_logger
+from config.settings import settings
 from database.connection import DBCon
+from database.errors import to_http_error
 from fastapi import HTTPException
+from utils.metrics import metrics, timed
 
 
 class QueryMode(Enum):
@@ -23,57 +23,84 @@ class QueryMode(Enum):
     FETCH_ALL = 1
     FETCH_ROW = 2
     FETCH_ONE = 3
+    FETCH_RECORDS = 4
 
 
-# Mapping of specific database exceptions to HTTP exceptions
-DB_ERROR_MAP = {
-    CheckViolationError: (400, "Check constraint violation"),
-    ForeignKeyViolationError: (409, "Foreign key violation"),
-    NotNullViolationError: (400, "Required field missing"),
-    UniqueViolationError: (409, "Duplicate record"),
-}
+# Literals and layout stripped from SQL to group statements of the same shape
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![$\w])\d+(?:\.\d+)?")
+SQL_TARGET = re.compile(r"\bpi\.\"?(\w+)|\b(\w+\.\w+)\s*\(")
 
 
-def handle_db_error(e: Exception) -> None:
-    """Convert database exceptions to HTTP exceptions."""
-    for exc_type, (status_code, detail) in DB_ERROR_MAP.items():
-        if isinstance(e, exc_type):
-            # Convert known database errors into corresponding HTTP exceptions
-            raise HTTPException(status_code=status_code, detail=detail) from e
-    # If exception is not in the mapping, re-raise it
-    raise e
+@lru_cache(maxsize=512)
+def classify_sql(query: str) -> Tuple[str, str, str]:
+    """Normalize a query and extract its operation and target table."""
+    normalized = SQL_LITERALS.sub("?", " ".join(query.split()))
+    op = normalized.split(" ", 1)[0].lower() if normalized else "unknown"
+    target = SQL_TARGET.search(normalized)
+    table = (target.group(1) or target.group(2)) if target else "unknown"
+    return normalized, op, table
+
+
+def record_timings(query: str, phases: dict, total: float) -> None:
+    """Feed phase timings into histograms and log the query if it was slow."""
+    normalized, op, table = classify_sql(query)
+    phases["total"] = total
+    for phase, seconds in phases.items():
+        metrics.observe(
+            "db_query_phase_seconds", seconds, table=table, op=op, phase=phase
+        )
+    threshold = settings.logging.slow_query_ms
+    if threshold and total * 1000 >= threshold:
+        breakdown = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in phases.items())
+        slow_query_logger.warning("Slow query (%s)\nQuery: %s;", breakdown, normalized)
 
 
 async def execute(
     query: str, role: str, qMode: QueryMode, params: Optional[Tuple[Any, ...]] = None
 ):
     """Execute a database query with the specified mode and parameters."""
-    logger.info(f"Role: [yellow]{role}[/yellow], Params: {params} \nQuery: {query};")
+    query_logger.info(
+        "Role: [yellow]%s[/yellow], Params: %s \nQuery: %s;", role, params, query
+    )
+    phases = {}
+    started = perf_counter()
     try:
         params = params or ()
 
-        async with DBCon.connect(role) as con:
+        async with DBCon.connect(role, phases=phases) as con:
             if qMode == QueryMode.FETCH_ONE:
                 # Execute query and return a single value
-                return await con.fetchval(query, *params)
+                with timed(phases, "query"):
+                    return await con.fetchval(query, *params)
             elif qMode == QueryMode.FETCH_ROW:
                 # Execute query and return a single row as a dictionary
-                if record := await con.fetchrow(query, *params):
-                    return dict(record)
+                with timed(phases, "query"):
+                    record = await con.fetchrow(query, *params)
+                if record:
+                    with timed(phases, "convert"):
+                        return dict(record)
                 raise HTTPException(status_code=404, detail="Item not found")
             elif qMode == QueryMode.FETCH_ALL:
                 # Execute query and return all rows as a list of dictionaries
-                records = await con.fetch(query, *params)
-                return [dict(record) for record in records] if records else []
+                with timed(phases, "query"):
+                    records = await con.fetch(query, *params)
+                with timed(phases, "convert"):
+                    return [dict(record) for record in records] if records else []
+            elif qMode == QueryMode.FETCH_RECORDS:
+                # Execute query and return all rows as asyncpg records
+                with timed(phases, "query"):
+                    return await con.fetch(query, *params)
             elif qMode == QueryMode.EXECUTE:
                 # Execute query without returning data
-                await con.execute(query, *params)
+                with timed(phases, "query"):
+                    await con.execute(query, *params)
                 return {"detail": "Operation completed successfully"}
 
+    except HTTPException:
+        # Already mapped, e.g. 404 or a constraint error seen by the connection
+        raise
     except Exception as e:
-        try:
-            # Handle known database errors
-            handle_db_error(e)
-        except Exception as e:
-            logger.error(f"Failed To Execute Operation: {e}")
-            raise HTTPException(status_code=500, detail="Operation Failed") from e
+        logger.error(f"Failed To Execute Operation: {e}")
+        raise to_http_error(e) from e
+    finally:
+        record_timings(query, phases, perf_counter() - started)
@@ -2,10 +2,13 @@
 
 """Defines CRUD operations for handling database records."""
 
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
-from config.logging import logger
+from asyncpg import Record
+from config.logging import logger, query_logger
+from config.settings import settings
 from database.connection import ConType, DBCon
+from database.errors import to_http_error
 from database.execution import QueryMode, execute
 from database.functions_meta import strip_validate_tab
 from database.query_builder import (
@@ -14,22 +17,39 @@ from database.query_builder import (
     DataOnlyList,
     KeyedData,
     KeyedDataList,
+    KeyedDataPage,
     KeysOnly,
     KeysOnlyList,
+    decode_cursor,
+    encode_cursor,
     split_record,
 )
 from fastapi import HTTPException
 from pydantic import BaseModel
-from utils.serialization import transform_values_types
+from utils.serialization import dump_keyed, get_coercer
 
 # Initialize CRUD instance for query caching and generation
 crud = CRUD()
 """Instance of the CRUD class for query caching and generation."""
 
 
+def to_keyed(
+    result: List[Record], pk_cols: List[str], raw: bool = False
+) -> KeyedDataList | bytes:
+    """Shape fetched rows as keyed records, or as JSON bytes on the fast path."""
+    if raw:
+        return dump_keyed(result, pk_cols)
+    return KeyedDataList(
+        records=[
+            KeyedData(keys=keys, data=data)
+            for keys, data in (split_record(r, pk_cols) for r in result)
+        ]
+    )
+
+
 async def gen_many(
-    role: str, table: str, data_only_list: DataOnlyList
-) -> KeyedDataList:
+    role: str, table: str, data_only_list: DataOnlyList, raw: bool = False
+) -> KeyedDataList | bytes:
     """Insert multiple records into a table."""
     if not data_only_list.records:
         raise ValueError("Empty records list")
@@ -43,38 +63,93 @@ async def gen_many(
     # Extract column names from the first record
     columns = list(data_only_list.records[0].data.keys())
 
-    # Prepare list of values for each record
-    records_values = [[r.data[col] for col in columns] for r in data_only_list.records]
+    # One array parameter per column keeps the statement text size-independent
+    params = [[r.data[col] for r in data_only_list.records] for col in columns]
 
-    # Flatten the list of lists into a single list of parameters
-    params = [val for record in records_values for val in record]
+    # Retrieve the canonical insert statement for this column shape
+    query = await crud.get_statement(role, table, "gen_many", columns)
 
-    cols_count = len(columns)
+    # Execute the query and fetch the inserted records
+    result = await execute(query, role, QueryMode.FETCH_RECORDS, tuple(params))
+    if not result:
+        raise HTTPException(status_code=500, detail="Insert failed")
 
-    # Construct SQL fragment for multiple record insertion with parameter placeholders
-    records_sql = ", ".join(
-        f"({', '.join(f'${i * cols_count + j + 1}' for j in range(cols_count))})"
-        for i in range(len(data_only_list.records))
-    )
+    return to_keyed(result, queries["pk_cols"], raw)
 
-    # Formulate the complete SQL query using the table name, columns, and records
-    query = queries["gen_many"].format(
-        table=table,
-        columns=", ".join(f'"{c}"' for c in columns),
-        records=records_sql,
-    )
 
-    # Execute the query and fetch the inserted records
-    result = await execute(query, role, QueryMode.FETCH_ALL, tuple(params))
+async def load_many(
+    role: str, table: str, data_only_list: DataOnlyList, raw: bool = False
+) -> KeyedDataList | bytes:
+    """Insert many records via COPY into a temporary staging table.
+
+    Records are copied in chunks and moved with a single INSERT ... SELECT,
+    which avoids the bind-parameter limit of a multi-row VALUES statement.
+    """
+    if not data_only_list.records:
+        raise ValueError("Empty records list")
+
+    # Validate and sanitize table name
+    table = await strip_validate_tab(role, table)
+
+    # Retrieve preformatted CRUD queries for the table
+    queries = await crud.get_queries(role, table)
+
+    # Extract column names from the first record
+    columns = list(data_only_list.records[0].data.keys())
+    columns_sql = ", ".join(f'"{c}"' for c in columns)
+    stage = f"stage_{table}"
+
+    chunk_size = settings.database.copy_chunk_size
+    records = data_only_list.records
+    try:
+        async with DBCon.connect(role) as conn:
+            async with conn.transaction():
+                # Staging table mirrors column types but none of the constraints;
+                # ON COMMIT DROP removes it without a DROP firing the DDL trigger
+                await conn.execute(
+                    f'CREATE TEMP TABLE "{stage}" ON COMMIT DROP AS '
+                    f"SELECT {columns_sql} FROM pi.{table} WITH NO DATA"
+                )
+                for start in range(0, len(records), chunk_size):
+                    await conn.copy_records_to_table(
+                        stage,
+                        records=[
+                            tuple(r.data[col] for col in columns)
+                            for r in records[start : start + chunk_size]
+                        ],
+                        columns=columns,
+                    )
+                result = await conn.fetch(
+                    f"INSERT INTO pi.{table} ({columns_sql}) "
+                    f'SELECT {columns_sql} FROM "{stage}" RETURNING *'
+                )
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Same mapping as execute(): constraint errors become 4xx, the rest 500
+        logger.error(f"Failed To Load Records: {e}")
+        raise to_http_error(e) from e
+
     if not result:
         raise HTTPException(status_code=500, detail="Insert failed")
 
-    return KeyedDataList(
-        records=[
-            KeyedData(keys=keys, data=data)
-            for keys, data in (split_record(r, queries["pk_cols"]) for r in result)
-        ]
-    )
+    return to_keyed(result, queries["pk_cols"], raw)
+
+
+def build_filters(
+    queries: Dict[str, Any], conditions: Dict[str, Any] = None
+) -> Tuple[List[str], List[Any]]:
+    """Build equality WHERE conditions and their parameters from filters."""
+    params = []
+    where_clauses = []
+    if conditions:
+        for k, v in conditions.items():
+            if k not in queries["columns"]:
+                raise HTTPException(status_code=400, detail=f"Invalid column: {k}")
+            param_index = len(params) + 1
+            where_clauses.append(f'"{k}" = ${param_index}')
+            params.append(v)
+    return where_clauses, params
 
 
 async def list_many(
@@ -84,29 +159,48 @@ async def list_many(
     columns: List[str] = None,
     limit: int = 20,
     offset: int = 0,
-) -> KeyedDataList:
-    """Select multiple records from a table with optional filtration and pagination."""
+    cursor: Optional[str] = None,
+    keyset: bool = False,
+    raw: bool = False,
+) -> KeyedDataPage | bytes:
+    """Select multiple records from a table with optional filtration and pagination.
+
+    In keyset mode rows are ordered by primary key and paged with an opaque
+    cursor instead of OFFSET, so any page costs the same as the first one.
+    """
 
     # Validate and sanitize table name
     table = await strip_validate_tab(role, table)
 
     # Retrieve preformatted CRUD queries for the table
     queries = await crud.get_queries(role, table)
+    pk_cols = queries["pk_cols"]
+    pk_sql = ", ".join(f'"{c}"' for c in pk_cols)
+    keyset = keyset or cursor is not None
 
     # Prepare filter conditions and corresponding parameters
-    params = []
-    where_clauses = []
-    if conditions:
-        for k, v in conditions.items():
-            if k not in queries["columns"]:
-                raise HTTPException(status_code=400, detail=f"Invalid column: {k}")
-            param_index = len(params) + 1
-            where_clauses.append(f'"{k}" = ${param_index}')
-            params.append(v)
+    where_clauses, params = build_filters(queries, conditions)
+
+    # Continue right after the last primary key of the previous page
+    if cursor:
+        try:
+            cursor_values = decode_cursor(cursor, pk_cols)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+        column_types = queries["column_types"]
+        bounds = ", ".join(
+            f"${len(params) + i + 1}::text::{column_types[col]}"
+            for i, col in enumerate(pk_cols)
+        )
+        where_clauses.append(f"({pk_sql}) > ({bounds})")
+        params.extend(cursor_values)
 
     # Construct the WHERE clause with filters and pagination
     where_clause = f"WHERE {' AND '.join(where_clauses)} " if where_clauses else ""
-    where_clause += f"LIMIT {limit} OFFSET {offset}"
+    if keyset:
+        where_clause += f"ORDER BY {pk_sql} LIMIT {limit}"
+    else:
+        where_clause += f"LIMIT {limit} OFFSET {offset}"
 
     # Determine columns to select
     select_columns = "*" if not columns else ", ".join(f'"{c}"' for c in columns)
@@ -119,19 +213,71 @@ async def list_many(
     )
 
     # Execute the query and fetch the records
-    result = await execute(query, role, QueryMode.FETCH_ALL, tuple(params))
+    result = await execute(query, role, QueryMode.FETCH_RECORDS, tuple(params))
 
-    return KeyedDataList(
-        records=[
-            KeyedData(keys=keys, data=data)
-            for keys, data in (split_record(r, queries["pk_cols"]) for r in result)
-        ]
+    # A full page means there may be more rows after the last returned key
+    next_cursor = None
+    if keyset and result and len(result) == limit:
+        next_cursor = encode_cursor(result[-1], pk_cols)
+
+    if raw:
+        return dump_keyed(result, pk_cols, next_cursor=next_cursor)
+    return KeyedDataPage(
+        records=to_keyed(result, pk_cols).records, next_cursor=next_cursor
+    )
+
+
+async def export_many(
+    role: str,
+    table: str,
+    conditions: Dict[str, Any] = None,
+    columns: List[str] = None,
+) -> Tuple[List[str], AsyncIterator[Record]]:
+    """Prepare a server-side cursor over all matching records of a table.
+
+    Validation happens eagerly so errors surface before the response starts;
+    the returned iterator then streams rows without materializing the result.
+    Returns the selected column names along with the iterator.
+    """
+
+    # Validate and sanitize table name
+    table = await strip_validate_tab(role, table)
+
+    # Retrieve preformatted CRUD queries for the table
+    queries = await crud.get_queries(role, table)
+
+    # Prepare filter conditions and corresponding parameters
+    where_clauses, params = build_filters(queries, conditions)
+    where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+
+    # Determine columns to select
+    select_columns = "*" if not columns else ", ".join(f'"{c}"' for c in columns)
+
+    # Formulate the complete SQL query
+    query = queries["list_many"].format(
+        columns=select_columns,
+        table=table,
+        where_clause=where_clause,
+    )
+    query_logger.info(
+        "Role: [yellow]%s[/yellow], Params: %s \nExport: %s", role, params, query
     )
 
+    async def stream() -> AsyncIterator[Record]:
+        # Cursors only live inside a transaction; the stream outlives the
+        # request scope, so it holds a connection of its own
+        async with DBCon.connect(role, reuse_scope=False) as conn:
+            async with conn.transaction():
+                prefetch = settings.database.export_prefetch
+                async for record in conn.cursor(query, *params, prefetch=prefetch):
+                    yield record
+
+    return columns or list(queries["columns"]), stream()
+
 
 async def trim_many(
-    role: str, table: str, keys_only_list: KeysOnlyList
-) -> KeyedDataList:
+    role: str, table: str, keys_only_list: KeysOnlyList, raw: bool = False
+) -> KeyedDataList | bytes:
     """Delete multiple records from a table."""
     if not keys_only_list.records:
         raise ValueError("Empty keys list")
@@ -142,42 +288,24 @@ async def trim_many(
     # Retrieve preformatted CRUD queries for the table
     queries = await crud.get_queries(role, table)
 
-    # Prepare primary key values for each record to delete
-    pk_count = len(queries["pk_cols"])
-    records_values = [
-        [k.keys[col] for col in queries["pk_cols"]] for k in keys_only_list.records
-    ]
+    # One array parameter per key column keeps the statement text size-independent
+    records = keys_only_list.records
+    params = [[k.keys[col] for k in records] for col in queries["pk_cols"]]
 
-    # Flatten the list of lists into a single list of parameters
-    params = [val for record in records_values for val in record]
-
-    # Construct WHERE conditions for each record based on primary keys
-    conditions = [
-        f"({' AND '.join(f'"{col}" = ${i * pk_count + j + 1}' for j, col in enumerate(queries['pk_cols']))})"
-        for i in range(len(keys_only_list.records))
-    ]
-
-    # Formulate the complete WHERE clause with OR conditions for multiple records
-    query = queries["trim_many"].format(
-        table=table, where_clause=f"WHERE {' OR '.join(conditions)}"
-    )
+    # Retrieve the canonical delete statement for this key shape
+    query = await crud.get_statement(role, table, "trim_many", queries["pk_cols"])
 
     # Execute the delete query and fetch the deleted records
-    result = await execute(query, role, QueryMode.FETCH_ALL, tuple(params))
+    result = await execute(query, role, QueryMode.FETCH_RECORDS, tuple(params))
     if not result:
         raise HTTPException(status_code=404, detail="No records deleted")
 
-    return KeyedDataList(
-        records=[
-            KeyedData(keys=keys, data=data)
-            for keys, data in (split_record(r, queries["pk_cols"]) for r in result)
-        ]
-    )
+    return to_keyed(result, queries["pk_cols"], raw)
 
 
 async def upd_many(
-    role: str, table: str, keyed_data_list: KeyedDataList
-) -> KeyedDataList:
+    role: str, table: str, keyed_data_list: KeyedDataList, raw: bool = False
+) -> KeyedDataList | bytes:
     """Update multiple records in a table using keyed data records and CTE."""
     if not keyed_data_list.records:
         raise ValueError("Empty records list")
@@ -196,61 +324,23 @@ async def upd_many(
     if not update_cols:
         raise HTTPException(status_code=400, detail="No columns to update")
 
-    # Retrieve column types for proper type casting in SQL
-    column_types = queries["column_types"]
-
     # Define the complete list of columns: primary keys + columns to update
     columns = queries["pk_cols"] + list(update_cols)
 
-    # Collect parameters in the correct order: primary keys followed by update values
-    params = []
-    for record in keyed_data_list.records:
-        # Add primary key values
-        for col in queries["pk_cols"]:
-            params.append(record.keys[col])
-        # Add update values
-        for col in update_cols:
-            params.append(record.data[col])
-
-    # Construct WHERE conditions for each record based on primary keys
-    conditions = []
-    for _ in keyed_data_list.records:
-        condition = " AND ".join(
-            f'{table}."{col}"::{column_types[col]} = cte."{col}"::{column_types[col]}'
-            for col in queries["pk_cols"]
-        )
-        conditions.append(f"({condition})")
-
-    # Formulate the complete WHERE clause with OR conditions for multiple records
-    where_clause = f"WHERE {' OR '.join(conditions)}"
-
-    # Construct SQL fragment for updating multiple records with type casting
-    cols_count = len(columns)
-    records_sql = ", ".join(
-        f"({', '.join(f'${i * cols_count + j + 1}::{column_types[columns[j]]}' for j in range(cols_count))})"
-        for i in range(len(keyed_data_list.records))
-    )
+    # One array parameter per column: primary keys followed by update values
+    records = keyed_data_list.records
+    params = [[r.keys[col] for r in records] for col in queries["pk_cols"]]
+    params += [[r.data[col] for r in records] for col in update_cols]
 
-    # Formulate the complete SQL update query
-    query = queries["upd_many"].format(
-        table=table,
-        columns=", ".join(f'"{c}"' for c in columns),
-        records=records_sql,
-        set_clause=", ".join(f'"{c}" = cte."{c}"' for c in update_cols),
-        where_clause=where_clause,
-    )
+    # Retrieve the canonical update statement for this column shape
+    query = await crud.get_statement(role, table, "upd_many", columns)
 
     # Execute the update query and fetch the updated records
-    result = await execute(query, role, QueryMode.FETCH_ALL, tuple(params))
+    result = await execute(query, role, QueryMode.FETCH_RECORDS, tuple(params))
     if not result:
         raise HTTPException(status_code=404, detail="No records updated")
 
-    return KeyedDataList(
-        records=[
-            KeyedData(keys=keys, data=data)
-            for keys, data in (split_record(r, queries["pk_cols"]) for r in result)
-        ]
-    )
+    return to_keyed(result, queries["pk_cols"], raw)
 
 
 def get_first_record(results: KeyedDataList) -> KeyedData:
@@ -309,40 +399,37 @@ async def create_wizard_transactional(
     main_entity: str,
     steps: List[WizardStep],
 ) -> WizardResult:
-    # Всё в одной транзакции на одном соединении
+    # 1) Всё, что может обратиться к метаданным, решаем до захвата соединения
+    plan: List[Tuple[WizardStep, str, List[str], List[Any], List[str]]] = []
+    for step in steps:
+        if step.mode == "select":
+            if not step.recordId:
+                raise HTTPException(400, f"No recordId for select on {step.entity}")
+            plan.append((step, "", [], [], []))
+            continue
+        if not step.data:
+            raise HTTPException(400, f"No data for insert on {step.entity}")
+        table = await strip_validate_tab(role, step.entity)
+        clean = (await get_coercer(role, table)).coerce(step.data)
+        cols = list(clean.keys())
+        queries = await crud.get_queries(role, table)
+        # Канонический текст, поэтому asyncpg переиспользует подготовленный запрос
+        sql = await crud.get_statement(role, table, "gen_one", cols)
+        plan.append((step, sql, cols, [clean[c] for c in cols], queries["pk_cols"]))
+    if main_entity not in {step.entity for step in steps}:
+        raise HTTPException(400, f"{main_entity} не встретился в шагах")
+
+    # 2) Транзакция длится ровно столько, сколько сами вставки
     async with DBCon.connect(role, ConType.SESSION) as conn:
         async with conn.transaction():
             pk_map: Dict[str, Dict[str, Any]] = {}
-            for step in steps:
+            for step, sql, cols, values, pk_cols in plan:
                 if step.mode == "select":
-                    if not step.recordId:
-                        raise HTTPException(
-                            400, f"No recordId for select on {step.entity}"
-                        )
                     pk_map[step.entity] = step.recordId
-                else:
-                    if not step.data:
-                        raise HTTPException(400, f"No data for insert on {step.entity}")
-                    # 1) очищаем и валидируем типы
-                    clean = await transform_values_types(role, step.entity, step.data)
-                    # 2) готовим INSERT ... RETURNING *;
-                    queries = await crud.get_queries(role, step.entity)
-                    cols = list(clean.keys())
-                    placeholders = ", ".join(f"${i + 1}" for i in range(len(cols)))
-                    sql = queries["gen_many"].format(
-                        table=await strip_validate_tab(role, step.entity),
-                        columns=", ".join(f'"{c}"' for c in cols),
-                        records=f"({placeholders})",
-                    )
-                    # 3) выполняем прямо на conn
-                    row = await conn.fetchrow(sql, *[clean[c] for c in cols])
-                    if not row:
-                        raise HTTPException(500, f"Insert failed for {step.entity}")
-                    # 4) достаём PK
-                    pk_map[step.entity] = {k: row[k] for k in queries["pk_cols"]}
-
-            if main_entity not in pk_map:
-                raise HTTPException(400, f"{main_entity} не встретился в шагах")
-            return WizardResult(
-                entity=main_entity, keys=pk_map[main_entity], allKeys=pk_map
-            )
+                    continue
+                row = await conn.fetchrow(sql, *values)
+                if not row:
+                    raise HTTPException(500, f"Insert failed for {step.entity}")
+                pk_map[step.entity] = {k: row[k] for k in pk_cols}
+
+    return WizardResult(entity=main_entity, keys=pk_map[main_entity], allKeys=pk_map)
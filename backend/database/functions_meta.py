@@ -2,13 +2,19 @@
 
 """Provides metadata utilities for database interactions."""
 
+import asyncio
+import time
 from enum import Enum
-from typing import List
-from aiocache import cached, Cache
-from config.logging import logger
-from database.connection import sanitize
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.logging import logger, query_logger
+from config.settings import settings
+from database.connection import DBCon, sanitize
 from database.execution import QueryMode, execute
+from database.notify import listener
 from fastapi import HTTPException
+from utils.metrics import metrics
 
 
 class QueryType(Enum):
@@ -20,6 +26,132 @@ class QueryType(Enum):
     DELETE = "DELETE"
 
 
+class MetaCache:
+    """In-process metadata cache, dropped whenever the database schema changes.
+
+    Entries never expire on their own while the change listener is running;
+    `ttl` is only set as a fallback when notifications are unavailable.
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.entries: Dict[Tuple, Tuple[Any, float]] = {}
+        self.version = 0
+        self.ttl = ttl
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+        self._subscribers: List[Callable[[], None]] = []
+
+    def subscribe(self, callback: Callable[[], None]):
+        """Register a callback invoked on every invalidation."""
+        self._subscribers.append(callback)
+
+    def invalidate(self, payload: Optional[str] = None):
+        """Drop all cached metadata and bump the metadata version."""
+        self.entries.clear()
+        self._locks.clear()
+        self.version += 1
+        logger.info(f"Metadata cache invalidated ({payload or 'reset'})")
+        for callback in self._subscribers:
+            callback()
+
+    def _lookup(self, key: Tuple):
+        entry = self.entries.get(key)
+        if entry and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+            return entry
+        return None
+
+    def contains(self, key: Tuple) -> bool:
+        """Check whether a fresh value is cached under the key."""
+        return self._lookup(key) is not None
+
+    def put(self, key: Tuple, value: Any, version: Optional[int] = None):
+        """Store a value unless the cache was invalidated since `version`."""
+        if version is None or version == self.version:
+            self.entries[key] = (value, time.monotonic())
+
+    async def get(self, key: Tuple, loader: Callable[[], Awaitable[Any]]):
+        """Return a cached value, loading it once even under concurrent misses."""
+        if entry := self._lookup(key):
+            metrics.inc("cache_hits_total", cache=key[0])
+            return entry[0]
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                if entry := self._lookup(key):
+                    metrics.inc("cache_hits_total", cache=key[0])
+                    return entry[0]
+                metrics.inc("cache_misses_total", cache=key[0])
+                version = self.version
+                value = await loader()
+                # Do not store results loaded across an invalidation
+                self.put(key, value, version)
+                return value
+        finally:
+            # Замки ключей, которые не попали в кэш (ошибки), не копим
+            if key not in self.entries and self._locks.get(key) is lock:
+                del self._locks[key]
+
+    def cached(self, func):
+        """Decorator caching an async function by its arguments."""
+
+        def key(*args, **kwargs) -> Tuple:
+            return (func.__name__, *args, *sorted(kwargs.items()))
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.get(key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.key = key
+        return wrapper
+
+
+meta_cache = MetaCache()
+"""Shared metadata cache for tables and schemas."""
+
+listener.subscribe("meta_changed", meta_cache.invalidate)
+
+META_NOTIFY_DDL = """
+CREATE OR REPLACE FUNCTION meta.notify_schema_change() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Temp tables (session context, COPY staging) never change metadata
+    IF EXISTS (
+        SELECT 1 FROM pg_event_trigger_ddl_commands()
+        WHERE schema_name IS NULL OR schema_name NOT LIKE 'pg_temp%'
+    ) THEN
+        PERFORM pg_notify('meta_changed', tg_tag);
+    END IF;
+END;
+$$;
+CREATE OR REPLACE FUNCTION meta.notify_schema_drop() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- DROP is only reported to sql_drop, with temp objects flagged
+    IF EXISTS (
+        SELECT 1 FROM pg_event_trigger_dropped_objects() WHERE NOT is_temporary
+    ) THEN
+        PERFORM pg_notify('meta_changed', tg_tag);
+    END IF;
+END;
+$$;
+DROP EVENT TRIGGER IF EXISTS meta_schema_change;
+CREATE EVENT TRIGGER meta_schema_change ON ddl_command_end
+    EXECUTE FUNCTION meta.notify_schema_change();
+DROP EVENT TRIGGER IF EXISTS meta_schema_drop;
+CREATE EVENT TRIGGER meta_schema_drop ON sql_drop
+    EXECUTE FUNCTION meta.notify_schema_drop();
+"""
+"""Event triggers announcing non-temporary DDL and GRANT/REVOKE on meta_changed."""
+
+
+async def watch_schema_changes():
+    """Install the DDL event triggers, falling back to a TTL without them."""
+    try:
+        await DBCon.install(META_NOTIFY_DDL, "Schema change event trigger")
+    except Exception as e:
+        logger.error(f"Schema change notifications unavailable: {e}")
+        meta_cache.ttl = settings.database.meta_cache_ttl
+
+
 async def get_enum_types(role: str):
     """Retrieve all enum types in the database."""
     query = "SELECT * FROM meta.get_enum_types()"
@@ -36,12 +168,12 @@ async def get_enum_labels(role: str, enum_name: str):
 async def get_tables(role: str, qType: QueryType = QueryType.SELECT):
     """Fetch tables the user has permissions for."""
     query = "SELECT * FROM meta.get_available_tables($1, $2)"
-    logger.info(query)
+    query_logger.info(query)
     params = (role, qType.value)
     return await execute(query, role, QueryMode.FETCH_ALL, params)
 
 
-@cached(ttl=30, cache=Cache.MEMORY)
+@meta_cache.cached
 async def get_cached_tables(role: str, qType: QueryType = QueryType.SELECT):
     """Fetch and cache table metadata."""
     try:
@@ -68,7 +200,7 @@ async def get_schema(role: str, table: str):
     return await execute(query, role, QueryMode.FETCH_ALL, params)
 
 
-@cached(ttl=30, cache=Cache.MEMORY)
+@meta_cache.cached
 async def get_cached_schema(role: str, table: str):
     """Fetch and cache schema details."""
     try:
@@ -78,6 +210,40 @@ async def get_cached_schema(role: str, table: str):
         raise HTTPException(500, "Cache failure")
 
 
+async def get_all_schemas(role: str) -> Dict[str, List[dict]]:
+    """Fetch schema details of every visible table in one round trip.
+
+    Uncached tables are loaded with a single batched query that also seeds
+    the per-table entries used by `get_cached_schema`.
+    """
+    tables = [rec["table_name"] for rec in await get_cached_tables(role)]
+    missing = [
+        t for t in tables if not meta_cache.contains(get_cached_schema.key(role, t))
+    ]
+    if missing:
+        version = meta_cache.version
+        query = """SELECT m.* FROM unnest($1::text[]) AS t (table_name),
+            LATERAL meta.get_relation_metadata(t.table_name) AS m"""
+        try:
+            rows = await execute(query, role, QueryMode.FETCH_ALL, (missing,))
+            grouped = {table: [] for table in missing}
+            for row in rows:
+                grouped.setdefault(row["table_name"], []).append(row)
+            for table, schema in grouped.items():
+                meta_cache.put(get_cached_schema.key(role, table), schema, version)
+        except HTTPException as e:
+            # Fall back to per-table loading below, isolating failing tables
+            logger.warning(f"Bulk metadata load failed: {e.detail}")
+
+    schemas = {}
+    for table in tables:
+        try:
+            schemas[table] = await get_cached_schema(role, table)
+        except HTTPException as e:
+            logger.info(f"Insufficient access was prevented for table '{table}': {e}")
+    return schemas
+
+
 async def get_pk_columns(role: str, table: str) -> List[str]:
     """Fetch primary key columns for a specific table."""
     schema = await get_cached_schema(role, table)
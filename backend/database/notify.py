@@ -0,0 +1,87 @@
+# backend/database/notify.py
+
+"""Dispatches PostgreSQL notifications from a dedicated listener connection."""
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+from config.logging import logger
+from config.settings import settings
+from database.connection import url
+
+
+class NotifyListener:
+    """Keeps one connection subscribed to channels and fans out notifications."""
+
+    def __init__(self):
+        self.conn: Optional[asyncpg.Connection] = None
+        self.channels: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[str]], None]):
+        """Register a callback for a channel; applied on the next (re)connect."""
+        self.channels.setdefault(channel, []).append(callback)
+
+    async def start(self):
+        """Open the listener connection and subscribe to all channels."""
+        self._closing = False
+        role = settings.database.get_role(settings.database.notify_role)
+        self.conn = await asyncpg.connect(dsn=url(role.uname, role.pword))
+        for channel in self.channels:
+            await self.conn.add_listener(channel, self._dispatch)
+        self.conn.add_termination_listener(self._on_termination)
+        logger.info(f"Listening for notifications on {', '.join(self.channels)}")
+
+    def retry(self):
+        """Keep connecting in the background after a failed start."""
+        if not self._closing and not self._reconnect_task:
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def stop(self):
+        """Close the listener connection and stop reconnecting."""
+        self._closing = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.conn and not self.conn.is_closed():
+            await self.conn.close()
+
+    def _dispatch(self, conn, pid: int, channel: str, payload: str):
+        """Deliver a notification payload to the channel's callbacks."""
+        for callback in self.channels.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Notification handler for {channel} failed: {e}")
+
+    def _on_termination(self, conn):
+        """Reconnect after losing the connection."""
+        if self._closing:
+            return
+        logger.warning("Notification listener connection lost, reconnecting")
+        self._reconnect_task = None
+        self.retry()
+
+    async def _reconnect(self):
+        """Retry connecting with exponential backoff, then resynchronize."""
+        delay = 1
+        while not self._closing:
+            try:
+                await self.start()
+            except Exception as e:
+                logger.error(f"Notification listener reconnect failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            # Notifications sent while disconnected are lost, so assume all
+            # changed; only now, since LISTEN is active again and nothing
+            # committed from here on can be missed
+            for channel in self.channels:
+                self._dispatch(self.conn, 0, channel, None)
+            self._reconnect_task = None
+            return
+
+
+listener = NotifyListener()
+"""Shared notification listener for cache invalidation."""
@@ -2,11 +2,14 @@
 
 """Provides utilities for building dynamic SQL queries and managing schema-based record definitions."""
 
-from typing import Any, Dict, Generic, List, Tuple, TypeVar
+import base64
+import json
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
 
-from database.functions_meta import get_cached_schema, get_pk_columns
+from database.functions_meta import get_cached_schema, get_pk_columns, meta_cache
 from pydantic import BaseModel, model_validator
-from cachetools import TTLCache
+from cachetools import LRUCache
+from utils.metrics import metrics
 
 
 class DictModel(BaseModel):
@@ -15,8 +18,8 @@ class DictModel(BaseModel):
     @model_validator(mode="after")
     def check_non_empty(cls, values):
         """Ensure that all fields are not None."""
-        for field_name, value in values.dict().items():
-            if value is None:
+        for field_name in type(values).model_fields:
+            if getattr(values, field_name) is None:
                 raise ValueError(f"{field_name} must not be None")
         return values
 
@@ -55,6 +58,12 @@ KeyedDataList = Records[KeyedData]
 """Model for a list of records with primary keys and data."""
 
 
+class KeyedDataPage(KeyedDataList):
+    """Model for a page of keyed records with an opaque cursor to the next page."""
+
+    next_cursor: Optional[str] = None
+
+
 def split_record(
     record: Dict[str, Any], pk_cols: List[str]
 ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
@@ -64,25 +73,132 @@ def split_record(
     }
 
 
+def encode_cursor(record: Dict[str, Any], pk_cols: List[str]) -> str:
+    """Encode primary key values of a record into an opaque pagination cursor."""
+    payload = json.dumps([str(record[k]) for k in pk_cols], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, pk_cols: List[str]) -> List[str]:
+    """Decode an opaque pagination cursor back into primary key values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != len(pk_cols):
+        raise ValueError("Cursor does not match primary key")
+    return [str(v) for v in values]
+
+
 class CRUDQueries:
     """SQL templates for common CRUD operations."""
 
     INSERT = "INSERT INTO pi.{table} ({columns}) VALUES {records} RETURNING *;"
+    INSERT_ARRAYS = (
+        "INSERT INTO pi.{table} ({columns}) SELECT * FROM unnest({arrays}) RETURNING *;"
+    )
     SELECT = "SELECT {columns} FROM pi.{table} {where_clause};"
-    DELETE = "DELETE FROM pi.{table} {where_clause} RETURNING *;"
-    UPDATE = "WITH cte ({columns}) AS (VALUES {records}) UPDATE pi.{table} SET {set_clause} FROM cte {where_clause} RETURNING *;"
+    DELETE = "DELETE FROM pi.{table} USING unnest({arrays}) AS cte ({columns}) WHERE {join_clause} RETURNING {table}.*;"
+    UPDATE = "UPDATE pi.{table} SET {set_clause} FROM unnest({arrays}) AS cte ({columns}) WHERE {join_clause} RETURNING {table}.*;"
+
+
+def array_params(columns: List[str], column_types: Dict[str, str]) -> str:
+    """Render one typed array placeholder per column."""
+    return ", ".join(f"${i + 1}::{column_types[c]}[]" for i, c in enumerate(columns))
+
+
+def join_on_keys(table: str, pk_cols: List[str]) -> str:
+    """Render the join of a table to the unnested key columns."""
+    return " AND ".join(f'{table}."{col}" = cte."{col}"' for col in pk_cols)
+
+
+def build_gen_many(table: str, columns: List[str], queries: Dict[str, Any]) -> str:
+    """Render an INSERT taking one typed array parameter per column."""
+    return CRUDQueries.INSERT_ARRAYS.format(
+        table=table,
+        columns=", ".join(f'"{c}"' for c in columns),
+        arrays=array_params(columns, queries["column_types"]),
+    )
+
+
+def build_gen_one(table: str, columns: List[str], queries: Dict[str, Any]) -> str:
+    """Render a single-row INSERT with one placeholder per column."""
+    placeholders = ", ".join(f"${i + 1}" for i in range(len(columns)))
+    return queries["gen_many"].format(
+        table=table,
+        columns=", ".join(f'"{c}"' for c in columns),
+        records=f"({placeholders})",
+    )
+
+
+def build_trim_many(table: str, columns: List[str], queries: Dict[str, Any]) -> str:
+    """Render a DELETE joined to unnested primary key arrays."""
+    return queries["trim_many"].format(
+        table=table,
+        columns=", ".join(f'"{c}"' for c in columns),
+        arrays=array_params(columns, queries["column_types"]),
+        join_clause=join_on_keys(table, columns),
+    )
+
+
+def build_upd_many(table: str, columns: List[str], queries: Dict[str, Any]) -> str:
+    """Render an UPDATE joined to unnested arrays, keys first in `columns`."""
+    pk_cols = queries["pk_cols"]
+    update_cols = columns[len(pk_cols) :]
+    return queries["upd_many"].format(
+        table=table,
+        columns=", ".join(f'"{c}"' for c in columns),
+        arrays=array_params(columns, queries["column_types"]),
+        set_clause=", ".join(f'"{c}" = cte."{c}"' for c in update_cols),
+        join_clause=join_on_keys(table, pk_cols),
+    )
+
+
+STATEMENT_BUILDERS = {
+    "gen_many": build_gen_many,
+    "gen_one": build_gen_one,
+    "trim_many": build_trim_many,
+    "upd_many": build_upd_many,
+}
+"""Renderers of canonical SQL for each cached CRUD operation."""
 
 
 class CRUD:
     """Cache and generate SQL queries dynamically based on table schema."""
 
     def __init__(self):
-        """Initialize the CRUD class with an empty query cache."""
-        self.query_cache = TTLCache(maxsize=128, ttl=30)
+        """Initialize the CRUD class with empty query and statement caches."""
+        self.query_cache = LRUCache(maxsize=128)
+        self.statement_cache = LRUCache(maxsize=1024)
+        # Templates and statements follow the schema, so drop them together
+        meta_cache.subscribe(self.clear)
+
+    def clear(self):
+        """Drop all cached queries and statements."""
+        self.query_cache.clear()
+        self.statement_cache.clear()
+
+    async def get_statement(
+        self, role: str, table: str, op: str, columns: List[str]
+    ) -> str:
+        """Retrieve or render canonical SQL for an operation on a column shape.
+
+        Values are bound as one array per column, so the statement text does not
+        depend on the batch size and asyncpg reuses one prepared plan for all.
+        """
+        key = (role, table, op, tuple(columns))
+        if key not in self.statement_cache:
+            queries = await self.get_queries(role, table)
+            self.statement_cache[key] = STATEMENT_BUILDERS[op](table, columns, queries)
+        return self.statement_cache[key]
 
     async def get_queries(self, role: str, table: str) -> Dict[str, Any]:
         """Retrieve or generate cached queries for a specific table."""
-        if table not in self.query_cache:
+        if table in self.query_cache:
+            metrics.inc("cache_hits_total", cache="crud_query_cache")
+        else:
+            metrics.inc("cache_misses_total", cache="crud_query_cache")
             # Retrieve table schema from cache
             schema = await get_cached_schema(role, table)
             if not schema:
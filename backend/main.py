@@ -1,23 +1,64 @@
 # backend/main.py
 """Main entry point for the FastAPI backend application."""
 
+import asyncio
+
 import uvicorn
 from auth.jwt_handler import decode_token
+from auth.revocation import denylist, watch_revocations
 from config.logging import log_cfg, logger
 from config.settings import settings
-from database.connection import pools
+from database.connection import DBCon, pools
+from database.functions_meta import (
+    get_all_schemas,
+    meta_cache,
+    watch_schema_changes,
+)
+from database.notify import listener
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from handlers.errors import general_error_handler, http_error_handler, jwt_error_handler
 from jose import JWTError
 from routes.auth_router import manual_token
 from setup.openapi import setup_schemas
 from setup.routers import setup_routes
+from utils.metrics import RequestTimingMiddleware
+from utils.static import CachedStaticFiles
+
+
+async def warm_up(app: FastAPI):
+    """Pre-warm pools and metadata, then mark the instance ready."""
+    roles = settings.database.prewarm_roles
+    delay = 1
+    while True:
+        try:
+            await pools.prewarm(roles, settings.database.prewarm_size)
+            await pools.get_auth_pool()
+            for role in roles:
+                await get_all_schemas(role)
+            break
+        except Exception as e:
+            logger.error(f"Warm-up failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+    app.state.ready = True
+    logger.info("Instance is warm and ready")
 
 
 async def lifespan(app: FastAPI):
     """Handles startup and shutdown events for the FastAPI application."""
+    if settings.database.guc_session:
+        await DBCon.install_session_view()
+    await watch_schema_changes()
+    # Слушатель нужен и кэшу метаданных, и списку отозванных токенов,
+    # поэтому он не зависит от установки их DDL
+    try:
+        await listener.start()
+    except Exception as e:
+        logger.error(f"Notification listener unavailable, retrying: {e}")
+        meta_cache.ttl = settings.database.meta_cache_ttl
+        listener.retry()
+    await watch_revocations()
     setup_user = settings.database.get_role("endpoint")
     # Get access token for the configured user
     token = await manual_token(setup_user.uname, setup_user.pword)
@@ -29,8 +70,16 @@ async def lifespan(app: FastAPI):
     # Setup OpenAPI schemas based on user roles
     await setup_schemas(app, role)
     app.state.payload = None
+    pools.start_sweeper()
+    # Warm up in the background, /api/ready answers 503 until it is done
+    app.state.ready = False
+    warming = asyncio.create_task(warm_up(app))
     yield
-    # Close all connection pools on shutdown
+    app.state.ready = False
+    warming.cancel()
+    denylist.stop_pruner()
+    # Close the listener and all connection pools on shutdown
+    await listener.stop()
     await pools.close_all_pools()
 
 
@@ -47,11 +96,14 @@ app.add_middleware(
     allow_methods=settings.cors.allow_methods,
     allow_headers=settings.cors.allow_headers,
 )
+app.add_middleware(RequestTimingMiddleware)
 
 if not settings.front_res_path.exists():
     logger.error(f"Frontend path {settings.front_res_path} not found")
     raise RuntimeError("Frontend directory missing")
-app.mount("/static", StaticFiles(directory=str(settings.front_res_path)), name="static")
+app.mount(
+    "/static", CachedStaticFiles(directory=str(settings.front_res_path)), name="static"
+)
 
 app.add_exception_handler(HTTPException, http_error_handler)
 app.add_exception_handler(JWTError, jwt_error_handler)
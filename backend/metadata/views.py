@@ -2,13 +2,13 @@
 
 """Builds JSON schemas for different view types based on table metadata."""
 
-from copy import deepcopy
+import asyncio
 from enum import Enum
 from functools import cached_property
 from typing import Any, Dict, List, Set
 
 from config.logging import logger
-from database.functions_meta import get_cached_schema
+from database.functions_meta import get_cached_schema, meta_cache
 from metadata.mapping import table_to_icon
 from metadata.schema import merge_json_data
 
@@ -225,34 +225,33 @@ class SchemaBuilder:
             "steps": [],
         }
 
-        # Скопируем уже готовые свойства основной схемы (с правильным primary_key)
-        main_properties = deepcopy(self.base_schema["properties"])
+        # Свойства основной схемы только читаются, поэтому копия не нужна
+        main_properties = self.base_schema["properties"]
         ref_schemas: Dict[str, Dict[str, Any]] = {}
 
         # Собираем список внешних таблиц по foreign_keys
-        for prop_details in main_properties.values():
-            for fk in prop_details.get("foreign_keys", []):
-                ref_table = fk.get("ref_table")
-                if ref_table and ref_table not in ref_schemas:
-                    try:
-                        schema_data = await get_cached_schema(
-                            payload["role"], ref_table
-                        )
-                        if not schema_data:
-                            logger.warning(
-                                f"No schema data for related table: {ref_table}"
-                            )
-                            continue
-
-                        # Построим для неё базовую схему так же, как для главной
-                        related_base = self.build_base_schema(schema_data)
-                        ref_schemas[ref_table] = {
-                            "title": f"{ref_table.replace('_', ' ').title()} Details",
-                            "icon": table_to_icon(ref_table),
-                            "properties": deepcopy(related_base["properties"]),
-                        }
-                    except Exception as e:
-                        logger.error(f"Failed to load schema for {ref_table}: {e}")
+        ref_tables = list(
+            dict.fromkeys(
+                fk["ref_table"]
+                for prop_details in main_properties.values()
+                for fk in prop_details.get("foreign_keys", [])
+                if fk.get("ref_table")
+            )
+        )
+        # Загружаем связанные схемы параллельно, а не по очереди
+        related = await asyncio.gather(
+            *(get_base_schema(payload["role"], t) for t in ref_tables),
+            return_exceptions=True,
+        )
+        for ref_table, related_base in zip(ref_tables, related):
+            if isinstance(related_base, Exception):
+                logger.error(f"Failed to load schema for {ref_table}: {related_base}")
+                continue
+            ref_schemas[ref_table] = {
+                "title": f"{ref_table.replace('_', ' ').title()} Details",
+                "icon": table_to_icon(ref_table),
+                "properties": related_base["properties"],
+            }
 
         # Убираем из main_properties все поля, которые влезли в отдельные шаги
         for ref_table in ref_schemas:
@@ -310,8 +309,27 @@ class SchemaBuilder:
         return {
             **self.view_schema(view_type.value),
             **self.entity_schema(self.base_schema["entity"]),
-            "properties": {
-                col_name: deepcopy(details)
-                for col_name, details in self.base_schema["properties"].items()
-            },
+            "properties": self.base_schema["properties"],
         }
+
+
+@meta_cache.cached
+async def get_base_schema(role: str, table: str) -> Dict[str, Any]:
+    """Build and cache the base schema of a table for the metadata version."""
+    schema = await get_cached_schema(role, table)
+    if not schema:
+        raise ValueError(f"No schema data for table: {table}")
+    return SchemaBuilder(schema).base_schema
+
+
+@meta_cache.cached
+async def get_view_schema(role: str, table: str, view: str) -> Dict[str, Any]:
+    """Build and cache a view schema of a table for the metadata version.
+
+    Cached schemas are shared between requests and must not be mutated.
+    """
+    metagen = SchemaBuilder()
+    metagen.base_schema = await get_base_schema(role, table)
+    if view == "WizardView":
+        return await metagen.build_wizard_view_schema({"role": role})
+    return metagen.build_view_schema(SchemaView(view))
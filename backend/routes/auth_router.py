@@ -4,6 +4,7 @@
 
 from auth.jwt_handler import JWTType, authenticate, decode_token, encode_token
 from auth.otp_handler import generate_otp, validate_otp
+from auth.revocation import revoke
 from config.logging import logger
 from fastapi import APIRouter, Depends, Form, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
@@ -64,11 +65,22 @@ async def validate_token(payload: dict = Depends(decode_token)):
 
 
 @auth_router.post("/token/revoke")
-async def revoke_token(payload: dict = Depends(decode_token)):
-    """Handles token revocation logic."""
-    # TODO: Implement token revocation logic
+async def revoke_token(
+    refresh_token: str = Form(None), payload: dict = Depends(decode_token)
+):
+    """Revokes the presented access token and, if given, its refresh token."""
     logger.info(f"Revoking token for user: {payload['uname']}")
-    return {"message": "To Be Done"}
+    revoked = [payload]
+    if refresh_token:
+        rt_payload = await decode_token(refresh_token, JWTType.RT)
+        if rt_payload["uname"] != payload["uname"]:
+            raise HTTPException(403, "Refresh token belongs to another user")
+        revoked.append(rt_payload)
+    for claims in revoked:
+        if "jti" not in claims:
+            raise HTTPException(400, "Token cannot be revoked, it has no jti")
+        await revoke(claims["jti"], claims["exp"])
+    return {"message": "Token revoked"}
 
 
 @auth_router.post("/message/generate")
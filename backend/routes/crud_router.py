@@ -2,16 +2,20 @@
 
 """Router for CRUD-related database operations."""
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from auth.jwt_handler import decode_token
+from config.settings import settings
+from database.connection import DBCon, sanitize
 from database.functions_crud import (
     WizardStep,
     create_wizard_transactional,
     del_one,
     edit_one,
+    export_many,
     gen_many,
     list_many,
+    load_many,
     new_one,
     read_one,
     trim_many,
@@ -22,27 +26,46 @@ from database.query_builder import (
     DataOnlyList,
     KeyedData,
     KeyedDataList,
+    KeyedDataPage,
     KeysOnly,
     KeysOnlyList,
 )
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from utils.serialization import (
+    get_coercer,
     parse_and_validate_columns,
     parse_and_validate_filters,
+    stream_csv,
+    stream_ndjson,
     transform_values_types,
 )
 
-# Initialize CRUD router with the tag "CRUD"
-crud_router = APIRouter(tags=["CRUD"])
-"""Router for CRUD-related database operations."""
-
 
 def get_role(payload: dict = Depends(decode_token)) -> str:
     """Extracts the user role from the decoded token payload."""
     return payload["role"]
 
 
-@crud_router.post("/tables/{table}/data/bulk", response_model=KeyedDataList)
+async def use_connection(role: str = Depends(get_role)):
+    """Shares one pooled connection across all queries of the request."""
+    async with DBCon.scope(role):
+        yield
+
+
+# Initialize CRUD router with the tag "CRUD"; the connection scope is function
+# scoped so the transaction commits, or fails, before the response is sent
+crud_router = APIRouter(
+    tags=["CRUD"], dependencies=[Depends(use_connection, scope="function")]
+)
+"""Router for CRUD-related database operations."""
+
+
+@crud_router.post(
+    "/tables/{table}/data/bulk",
+    response_class=JSONResponse,
+    responses={200: {"model": KeyedDataList}},
+)
 async def gen_data(
     table: str, data_only_list: DataOnlyList, role: str = Depends(get_role)
 ):
@@ -50,35 +73,90 @@ async def gen_data(
     if not data_only_list.records:
         raise HTTPException(status_code=400, detail="Data list cannot be empty.")
 
-    transformed_records = []
-    for record in data_only_list.records:
-        transformed_data = await transform_values_types(role, table, record.data)
-        transformed_records.append(DataOnly(data=transformed_data))
+    coercer = await get_coercer(role, table)
+    transformed_records = [
+        DataOnly(data=data)
+        for data in coercer.coerce_many([r.data for r in data_only_list.records])
+    ]
 
     transformed_data_only_list = DataOnlyList(records=transformed_records)
-    return await gen_many(role, table, transformed_data_only_list)
-
-
-@crud_router.get("/tables/{table}/data/bulk", response_model=KeyedDataList)
+    # Large payloads go through COPY to avoid the bind-parameter limit
+    if len(transformed_records) > settings.database.copy_threshold:
+        result = await load_many(role, table, transformed_data_only_list, raw=True)
+    else:
+        result = await gen_many(role, table, transformed_data_only_list, raw=True)
+    return Response(result, media_type="application/json")
+
+
+@crud_router.get(
+    "/tables/{table}/data/bulk",
+    response_class=JSONResponse,
+    responses={200: {"model": KeyedDataPage}},
+)
 async def list_data(
     table: str,
     filters: Optional[str] = Query(None),  # Фильтры как JSON-строка
     columns: Optional[str] = Query(None),  # Колонки как JSON-строка
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),  # Курсор из next_cursor прошлой страницы
+    keyset: bool = Query(False),  # Пагинация по первичному ключу вместо OFFSET
+    role: str = Depends(get_role),
+):
+    """Select multiple records from a table with optional filtration and pagination.
+
+    Pass `keyset=true` (or a `cursor`) to page by primary key; the response then
+    carries `next_cursor` for the following page.
+    """
+
+    filters = await parse_and_validate_filters(role, table, filters, False)
+    columns = await parse_and_validate_columns(role, table, columns, False)
+
+    filters = await transform_values_types(role, table, filters)
+
+    result = await list_many(
+        role, table, filters, columns, limit, offset, cursor, keyset, raw=True
+    )
+    return Response(result, media_type="application/json")
+
+
+EXPORT_FORMATS = {
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+    "csv": (stream_csv, "text/csv"),
+}
+
+
+@crud_router.get("/tables/{table}/data/export")
+async def export_data(
+    table: str,
+    filters: Optional[str] = Query(None),  # Фильтры как JSON-строка
+    columns: Optional[str] = Query(None),  # Колонки как JSON-строка
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
     role: str = Depends(get_role),
 ):
-    """Select multiple records from a table with optional filtration and pagination."""
+    """Stream all matching records of a table as NDJSON or CSV."""
 
     filters = await parse_and_validate_filters(role, table, filters, False)
     columns = await parse_and_validate_columns(role, table, columns, False)
 
     filters = await transform_values_types(role, table, filters)
 
-    return await list_many(role, table, filters, columns, limit, offset)
+    columns, records = await export_many(role, table, filters, columns)
+    encoder, media_type = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        encoder(records, columns),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{sanitize(table)}.{fmt}"'
+        },
+    )
 
 
-@crud_router.delete("/tables/{table}/data/bulk", response_model=KeyedDataList)
+@crud_router.delete(
+    "/tables/{table}/data/bulk",
+    response_class=JSONResponse,
+    responses={200: {"model": KeyedDataList}},
+)
 async def trim_data(
     table: str, keys_only_list: KeysOnlyList, role: str = Depends(get_role)
 ):
@@ -86,10 +164,15 @@ async def trim_data(
     if not keys_only_list.records:
         raise HTTPException(status_code=400, detail="Records list cannot be empty.")
 
-    return await trim_many(role, table, keys_only_list)
+    result = await trim_many(role, table, keys_only_list, raw=True)
+    return Response(result, media_type="application/json")
 
 
-@crud_router.put("/tables/{table}/data/bulk", response_model=KeyedDataList)
+@crud_router.put(
+    "/tables/{table}/data/bulk",
+    response_class=JSONResponse,
+    responses={200: {"model": KeyedDataList}},
+)
 async def upd_data(
     table: str, keyed_data_list: KeyedDataList, role: str = Depends(get_role)
 ):
@@ -97,16 +180,19 @@ async def upd_data(
     if not keyed_data_list.records:
         raise HTTPException(status_code=400, detail="Records list cannot be empty.")
 
-    transformed_records = []
-    for record in keyed_data_list.records:
-        transformed_keys = await transform_values_types(role, table, record.keys)
-        transformed_data = await transform_values_types(role, table, record.data)
-        transformed_records.append(
-            KeyedData(keys=transformed_keys, data=transformed_data)
+    coercer = await get_coercer(role, table)
+    records = keyed_data_list.records
+    transformed_records = [
+        KeyedData(keys=keys, data=data)
+        for keys, data in zip(
+            coercer.coerce_many([r.keys for r in records]),
+            coercer.coerce_many([r.data for r in records]),
         )
+    ]
 
     transformed_keyed_data_list = KeyedDataList(records=transformed_records)
-    return await upd_many(role, table, transformed_keyed_data_list)
+    result = await upd_many(role, table, transformed_keyed_data_list, raw=True)
+    return Response(result, media_type="application/json")
 
 
 @crud_router.post("/tables/{table}/data", response_model=KeyedData)
@@ -161,9 +247,5 @@ async def edit_data(
 async def create_wizard(
     table: str, steps: List[WizardStep], role: str = Depends(get_role)
 ):
-    # 1) по-надёжному трансформируем и валидируем входящие JSON-данные
-    for step in steps:
-        if step.mode == "insert":
-            step.data = await transform_values_types(role, step.entity, step.data)
-    # 2) вызываем уже готовую централизованную функцию
+    # Типы, таблицы и запросы разрешаются внутри до открытия транзакции
     return await create_wizard_transactional(role, table, steps)
@@ -2,83 +2,203 @@
 
 """Router for metadata-related operations."""
 
+import asyncio
+from typing import Any, Dict
+
 from auth.jwt_handler import decode_token
 from config.logging import logger
 from database.connection import sanitize  # Допустим, sanitize нужен
 from database.execution import QueryMode, execute  # Допустим, execute нужен
 from database.functions_meta import (
-    get_cached_schema,
+    get_all_schemas,
     get_cached_tables,
     get_enum_labels,
     get_enum_types,
+    meta_cache,
 )
-from fastapi import APIRouter, Depends
-from metadata.views import SchemaBuilder, SchemaView
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from metadata.views import SchemaView, get_base_schema, get_view_schema
+from utils.serialization import JSONDocument, to_document
+from utils.static import etag_matches
 
 meta_router = APIRouter(tags=["Meta"])
 """Router for metadata-related operations."""
 
+BUNDLE_VIEWS = [view.value for view in SchemaView] + ["WizardView"]
+"""View schemas included in a table's schema bundle."""
+
+
+def document_response(request: Request, doc: JSONDocument) -> Response:
+    """Answer with the encoded document, or 304 if the client already has it."""
+    # Документы зависят от роли, поэтому кэш только приватный и с ревалидацией
+    headers = {"ETag": doc.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), doc.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(doc.body, media_type="application/json", headers=headers)
+
+
+@meta_cache.cached
+async def enum_types_document(role: str) -> JSONDocument:
+    """Encode and cache the enum types of a role."""
+    return to_document(await get_enum_types(role))
+
+
+@meta_cache.cached
+async def enum_labels_document(role: str, enum_type: str) -> JSONDocument:
+    """Encode and cache the labels of an enum type."""
+    labels = await get_enum_labels(role, enum_type)
+    if not labels:
+        # Исключение не кэшируется: произвольные имена не растят кэш
+        raise HTTPException(status_code=404, detail="Enum type not found")
+    return to_document(labels)
+
+
+@meta_cache.cached
+async def tables_document(role: str) -> JSONDocument:
+    """Encode and cache the tables visible to a role."""
+    return to_document(await get_cached_tables(role))
+
+
+@meta_cache.cached
+async def table_schema_document(role: str, table: str) -> JSONDocument:
+    """Encode and cache the base schema of a table."""
+    return to_document(await get_base_schema(role, table))
+
+
+@meta_cache.cached
+async def view_schema_document(role: str, table: str, view: str) -> JSONDocument:
+    """Encode and cache a view schema of a table."""
+    return to_document(await get_view_schema(role, table, view))
+
+
+@meta_cache.cached
+async def tables_schemas_document(role: str) -> JSONDocument:
+    """Encode and cache the base schemas of all tables of a role."""
+    return to_document(await get_tables_schemas(role))
+
+
+@meta_cache.cached
+async def table_bundle_document(role: str, table: str) -> JSONDocument:
+    """Encode and cache the schema bundle of a table."""
+    return to_document(await get_table_bundle(role, table))
+
+
+@meta_cache.cached
+async def tables_bundles_document(role: str) -> JSONDocument:
+    """Encode and cache the schema bundles of all tables of a role."""
+    return to_document(await get_tables_bundles(role))
+
 
 @meta_router.get("/enums")
-async def list_enum_types(payload: dict = Depends(decode_token)):
+async def list_enum_types(request: Request, payload: dict = Depends(decode_token)):
     """Lists all available enum types for the user's role."""
-    return await get_enum_types(payload["role"])
+    return document_response(request, await enum_types_document(payload["role"]))
 
 
 @meta_router.get("/enums/{enum_type}")
-async def list_enum_labels(enum_type: str, payload: dict = Depends(decode_token)):
+async def list_enum_labels(
+    request: Request, enum_type: str, payload: dict = Depends(decode_token)
+):
     """Lists all labels for a specific enum type."""
-    return await get_enum_labels(payload["role"], enum_type)
+    doc = await enum_labels_document(payload["role"], enum_type)
+    return document_response(request, doc)
 
 
 @meta_router.get("/tables")
-async def list_tables(payload: dict = Depends(decode_token)):
+async def list_tables(request: Request, payload: dict = Depends(decode_token)):
     """Lists all database tables accessible to the user's role."""
-    return await get_cached_tables(payload["role"])
+    return document_response(request, await tables_document(payload["role"]))
 
 
 async def get_table_schema(role: str, table: str):
     """Retrieves the schema definition for a specific table."""
-    schema = await get_cached_schema(role, table)
-    metagen = SchemaBuilder(schema)
-    return metagen.build_base_schema(schema)
+    return await get_base_schema(role, table)
+
+
+async def get_tables_schemas(role: str):
+    """Builds base schemas of all accessible tables from one metadata load."""
+    schemas = {}
+    for table in await get_all_schemas(role):
+        try:
+            schemas[table] = await get_base_schema(role, table)
+        except ValueError as e:
+            logger.warning(f"Schema for table '{table}' was skipped: {e}")
+    return schemas
+
+
+async def get_table_bundle(role: str, table: str) -> Dict[str, Any]:
+    """Collects the base schema and every view schema of a table."""
+    base = await get_base_schema(role, table)
+    # Все представления строятся поверх одной закэшированной базовой схемы
+    views = await asyncio.gather(
+        *(get_view_schema(role, table, view) for view in BUNDLE_VIEWS)
+    )
+    return {"base": base, **dict(zip(BUNDLE_VIEWS, views))}
+
+
+async def get_tables_bundles(role: str) -> Dict[str, Dict[str, Any]]:
+    """Collects schema bundles of all accessible tables from one metadata load."""
+    bundles = {}
+    for table in await get_all_schemas(role):
+        try:
+            bundles[table] = await get_table_bundle(role, table)
+        except ValueError as e:
+            logger.warning(f"Bundle for table '{table}' was skipped: {e}")
+    return bundles
 
 
 @meta_router.get("/tables/{table}/schema")
-async def table_schema(table: str, payload: dict = Depends(decode_token)):
+async def table_schema(
+    request: Request, table: str, payload: dict = Depends(decode_token)
+):
     """Fetches the schema of the specified table."""
-    return await get_table_schema(payload["role"], table)
+    doc = await table_schema_document(payload["role"], table)
+    return document_response(request, doc)
+
+
+@meta_router.get("/tables/{table}/schema/bundle")
+async def table_schema_bundle(
+    request: Request, table: str, payload: dict = Depends(decode_token)
+):
+    """Fetches the base schema and all view schemas of the table at once."""
+    doc = await table_bundle_document(payload["role"], table)
+    return document_response(request, doc)
 
 
 @meta_router.get("/tables/{table}/schema/WizardView")
-async def table_wizard_schema(table: str, payload: dict = Depends(decode_token)):
+async def table_wizard_schema(
+    request: Request, table: str, payload: dict = Depends(decode_token)
+):
     """Fetches the schema of the table in WizardView format."""
-    schema = await get_cached_schema(payload["role"], table)
-    metagen = SchemaBuilder(schema)
-    return await metagen.build_wizard_view_schema(payload)
+    doc = await view_schema_document(payload["role"], table, "WizardView")
+    return document_response(request, doc)
 
 
 @meta_router.get("/tables/{table}/schema/{viewType}")
 async def table_view_schema(
-    table: str, viewType: SchemaView, payload: dict = Depends(decode_token)
+    request: Request,
+    table: str,
+    viewType: SchemaView,
+    payload: dict = Depends(decode_token),
 ):
     """Fetches the schema of the table for a specific view type."""
-    logger.info(viewType.value)
-    schema = await get_cached_schema(payload["role"], table)
-    metagen = SchemaBuilder(schema)
-    return metagen.build_view_schema(viewType)
+    doc = await view_schema_document(payload["role"], table, viewType.value)
+    return document_response(request, doc)
 
 
 @meta_router.get("/tables/schemas")
-async def tables_schemas(payload: dict = Depends(decode_token)):
+async def tables_schemas(request: Request, payload: dict = Depends(decode_token)):
     """Fetches schemas for all tables accessible to the user's role."""
-    schemas = {}
-    tables = await get_cached_tables(payload["role"])
-    for tab in tables:
-        table = tab.get("table_name")
-        schema = await table_schema(table, payload)
-        schemas[table] = schema
-    return schemas
+    return document_response(request, await tables_schemas_document(payload["role"]))
+
+
+@meta_router.get("/tables/schemas/bundle")
+async def tables_schemas_bundle(
+    request: Request, payload: dict = Depends(decode_token)
+):
+    """Fetches schema bundles for all tables accessible to the user's role."""
+    doc = await tables_bundles_document(payload["role"])
+    return document_response(request, doc)
 
 
 @meta_router.get("/tables/{table}/refs")
@@ -0,0 +1,27 @@
+# backend/routes/monitor_router.py
+
+"""Router for monitoring endpoints."""
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from utils.metrics import metrics
+
+monitor_router = APIRouter(tags=["Monitor"])
+"""Router for monitoring endpoints."""
+
+
+@monitor_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Exposes pool, cache and latency metrics in Prometheus text format."""
+    # Only in-process counters are read, so scraping never touches the database
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@monitor_router.get("/ready")
+async def get_ready(request: Request):
+    """Reports whether pools and the metadata cache are warm."""
+    if not getattr(request.app.state, "ready", False):
+        raise HTTPException(503, "Warming up")
+    return {"status": "ready"}
@@ -2,13 +2,10 @@
 
 """Router for serving the Single Page Application (SPA)."""
 
-from os.path import join
-
-from config.logging import logger
 from config.settings import settings
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 from fastapi.exceptions import HTTPException
-from fastapi.responses import FileResponse
+from utils.static import accepted_encodings, etag_matches, load_shell
 
 spa_router = APIRouter(tags=["SPA"])
 """Router for serving the Single Page Application (SPA)."""
@@ -17,11 +14,17 @@ spa_router = APIRouter(tags=["SPA"])
 @spa_router.get("/{full_path:path}")
 async def serve_spa(request: Request, full_path: str):
     """Serves the SPA for non-API paths."""
-    logger.info(f"Request received for path: {full_path}")
     # Skip serving SPA for API requests
     if full_path.startswith("api/"):
-        logger.info(f"API request detected for {full_path}, skipping...")
         raise HTTPException(status_code=404)  # Throw 404, to allow FastAPI search route
-    # Serve SPA for all other requests
-    logger.info(f"SPA request detected for {full_path}, serving index.html")
-    return FileResponse(join(str(settings.front_res_path), "index.html"))
+    # Оболочка читается с диска один раз и дальше отдаётся из памяти
+    shell = load_shell(settings.front_res_path / "index.html")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    body, etag = shell.body, shell.etag
+    if "gzip" in accepted_encodings(request.headers.get("accept-encoding", "")):
+        body, etag = shell.gzipped, shell.gzipped_etag
+        headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="text/html", headers=headers)
@@ -3,23 +3,14 @@
 """Module for setting up OpenAPI schemas."""
 
 from config.logging import logger
-from database.functions_meta import get_cached_tables
 from fastapi import FastAPI
-from routes.meta_router import get_table_schema
+from routes.meta_router import get_tables_schemas
 
 
 async def setup_schemas(app: FastAPI, role: str):
     """Generate and initialize OpenAPI schemas dynamically based on user roles."""
-    tables = await get_cached_tables(role)
-    schemas = {}
-    for tab in tables:
-        table = tab.get("table_name")
-        try:
-            schema = await get_table_schema(role, table)
-            schemas[table] = schema
-            logger.info(f"Created JSON-Schema '{table}'")
-        except Exception as e:
-            logger.info(f"Insufficient access was prevented for table '{table}': {e}")
+    schemas = await get_tables_schemas(role)
+    logger.info(f"Created JSON-Schemas for {len(schemas)} tables")
     initialize_openapi(app, schemas)
     app.openapi_schema = None
     app.openapi()
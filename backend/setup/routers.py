@@ -15,6 +15,7 @@ from routes.bss_ops.org_line import org_line_router
 from routes.bss_ops.reports import reports_router
 from routes.crud_router import crud_router
 from routes.meta_router import meta_router
+from routes.monitor_router import monitor_router
 from routes.spa_router import spa_router
 
 
@@ -32,6 +33,7 @@ async def setup_routes(app: FastAPI, role: str):
     app.include_router(mkg_line_router, prefix="/api")
     app.include_router(org_line_router, prefix="/api")
     app.include_router(reports_router, prefix="/api")
+    app.include_router(monitor_router, prefix="/api")
     # Include the router for the Single Page Application without a prefix
     app.include_router(spa_router)
     logger.info("Routes have been set up successfully.")
@@ -0,0 +1,73 @@
+# backend/tests/bench_keyed.py
+
+"""Compares the model-based and the raw JSON response paths for keyed records.
+
+Run from the backend directory: python -m tests.bench_keyed
+"""
+
+import json
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+# Заглушки настроек из conftest.py нужны до импорта модулей приложения
+import tests.conftest  # noqa: F401
+from database.query_builder import KeyedData, KeyedDataList, split_record
+from utils.serialization import dump_keyed
+
+COLUMNS = ["salesorder_id", "customer_id", "status", "total", "created_at", "note"]
+PK_COLS = ["salesorder_id"]
+
+
+class FakeRecord(tuple):
+    """Tuple with name lookups, standing in for asyncpg.Record."""
+
+    def keys(self):
+        return iter(COLUMNS)
+
+    def items(self):
+        return zip(COLUMNS, self)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = COLUMNS.index(key)
+        return tuple.__getitem__(self, key)
+
+
+def make_rows(count: int):
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        FakeRecord((i, i % 97, "accepted", Decimal("19.90"), created, f"order {i}"))
+        for i in range(count)
+    ]
+
+
+def model_path(rows):
+    """dict() per row, split, KeyedData models, then FastAPI-style revalidation."""
+    result = [dict(r) for r in rows]
+    model = KeyedDataList(
+        records=[
+            KeyedData(keys=keys, data=data)
+            for keys, data in (split_record(r, PK_COLS) for r in result)
+        ]
+    )
+    validated = KeyedDataList.model_validate(model.model_dump())
+    return json.dumps(validated.model_dump(mode="json")).encode()
+
+
+def raw_path(rows):
+    """Straight from records to JSON bytes."""
+    return dump_keyed(rows, PK_COLS)
+
+
+if __name__ == "__main__":
+    for count in (100, 10_000):
+        rows = make_rows(count)
+        assert json.loads(model_path(rows)) == json.loads(raw_path(rows))
+        number = max(1, 100_000 // count)
+        model = min(timeit.repeat(lambda: model_path(rows), number=number, repeat=5))
+        raw = min(timeit.repeat(lambda: raw_path(rows), number=number, repeat=5))
+        print(
+            f"{count:>6} rows: model {model / number * 1000:8.2f} ms, "
+            f"raw {raw / number * 1000:8.2f} ms, speedup x{model / raw:.1f}"
+        )
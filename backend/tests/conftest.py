@@ -0,0 +1,17 @@
+# backend/tests/conftest.py
+
+"""Settings stubs needed before application modules are imported."""
+
+import os
+import tempfile
+
+# Settings require the passwords, no database is contacted by the tests
+for name in (
+    "DB_DB_POSTGRES_PASSWORD",
+    "DB_DB_ENDPOINT_PASSWORD",
+    "DB_DB_CUSTOMER_PASSWORD",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault(
+    "LOG_LOGS_HISTORY_FILENAME", os.path.join(tempfile.gettempdir(), "history.log")
+)
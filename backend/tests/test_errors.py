@@ -0,0 +1,46 @@
+# backend/tests/test_errors.py
+
+"""Tests for mapping database errors to HTTP errors."""
+
+import pytest
+from asyncpg.exceptions import (
+    ForeignKeyViolationError,
+    UndefinedTableError,
+    UniqueViolationError,
+)
+from database.connection import DBCon
+from database.errors import to_http_error
+from fastapi import HTTPException
+
+
+@pytest.mark.parametrize(
+    "error, status, detail",
+    [
+        (UniqueViolationError("duplicate key"), 409, "Duplicate record"),
+        (ForeignKeyViolationError("fk"), 409, "Foreign key violation"),
+        (UndefinedTableError('relation "pi.secret" does not exist'), 500, None),
+        (RuntimeError("connection reset"), 500, None),
+    ],
+)
+def test_to_http_error(error, status, detail):
+    """Constraint errors map to 4xx, the rest to a 500 without database text."""
+    mapped = to_http_error(error)
+    assert mapped.status_code == status
+    assert mapped.detail == (detail or "Operation Failed")
+
+
+def test_http_error_kept():
+    """HTTP errors raised inside a connection keep their status."""
+    error = HTTPException(404, "Item not found")
+    assert to_http_error(error) is error
+    with pytest.raises(HTTPException) as exc:
+        DBCon._fail(error)
+    assert exc.value is error
+
+
+def test_fail_hides_database_text():
+    """Connection failures are logged in full but answered generically."""
+    with pytest.raises(HTTPException) as exc:
+        DBCon._fail(UndefinedTableError('relation "pi.secret" does not exist'))
+    assert exc.value.status_code == 500
+    assert "secret" not in exc.value.detail
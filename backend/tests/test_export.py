@@ -0,0 +1,142 @@
+# backend/tests/test_export.py
+
+"""Tests for streamed NDJSON and CSV exports."""
+
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from auth.jwt_handler import decode_token
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import crud_router
+from utils.serialization import stream_csv, stream_ndjson
+
+COLUMNS = ["id", "placed_at", "wait", "price", "paid", "extra"]
+ROWS = [
+    {
+        "id": 1,
+        "placed_at": datetime(2015, 1, 1, 10, tzinfo=timezone.utc),
+        "wait": timedelta(hours=2, minutes=30),
+        "price": Decimal("12.50"),
+        "paid": True,
+        "extra": {"gift": "да"},
+    },
+    {
+        "id": 2,
+        "placed_at": datetime(2015, 1, 2, 8, 15),
+        "wait": timedelta(days=1),
+        "price": None,
+        "paid": False,
+        "extra": None,
+    },
+]
+
+
+async def records(rows):
+    """Yield rows the way the export cursor does."""
+    for row in rows:
+        yield row
+
+
+def encode(encoder, rows, chunk_rows=500):
+    """Collect the chunks an encoder produces for the rows."""
+
+    async def run():
+        return [
+            chunk
+            async for chunk in encoder(records(rows), COLUMNS, chunk_rows=chunk_rows)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_ndjson_encodes_like_api():
+    """NDJSON lines use the API encoding of timestamps and intervals."""
+    lines = b"".join(encode(stream_ndjson, ROWS)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {
+            "id": 1,
+            "placed_at": "2015-01-01T10:00:00Z",
+            "wait": "PT2H30M",
+            "price": "12.50",
+            "paid": True,
+            "extra": {"gift": "да"},
+        },
+        {
+            "id": 2,
+            "placed_at": "2015-01-02T08:15:00",
+            "wait": "P1D",
+            "price": None,
+            "paid": False,
+            "extra": None,
+        },
+    ]
+
+
+def test_csv_encodes_like_api():
+    """CSV cells use the API encoding, nested values as JSON."""
+    body = b"".join(encode(stream_csv, ROWS)).decode()
+    assert list(csv.reader(io.StringIO(body))) == [
+        COLUMNS,
+        ["1", "2015-01-01T10:00:00Z", "PT2H30M", "12.50", "true", '{"gift":"да"}'],
+        ["2", "2015-01-02T08:15:00", "P1D", "", "false", ""],
+    ]
+
+
+def test_csv_header_without_rows():
+    """An empty selection still gets the header row."""
+    assert encode(stream_csv, []) == [(",".join(COLUMNS) + "\r\n").encode()]
+
+
+def test_ndjson_without_rows():
+    """An empty selection is an empty body."""
+    assert encode(stream_ndjson, []) == []
+
+
+@pytest.mark.parametrize("encoder", [stream_ndjson, stream_csv])
+def test_chunks(encoder):
+    """Rows are flushed in chunks of chunk_rows."""
+    chunks = encode(encoder, ROWS * 3, chunk_rows=2)
+    assert len(chunks) == 3
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Export route of the customer role over a fake table with no matches."""
+
+    async def passthrough(role, table, value, *args):
+        return value or {}
+
+    async def all_columns(role, table, value, *args):
+        return []
+
+    async def export_many(role, table, filters, columns):
+        return columns or COLUMNS, records([])
+
+    monkeypatch.setattr(crud_router, "parse_and_validate_filters", passthrough)
+    monkeypatch.setattr(crud_router, "transform_values_types", passthrough)
+    monkeypatch.setattr(crud_router, "parse_and_validate_columns", all_columns)
+    monkeypatch.setattr(crud_router, "export_many", export_many)
+
+    async def no_connection():
+        yield
+
+    app = FastAPI()
+    app.include_router(crud_router.crud_router)
+    app.dependency_overrides[decode_token] = lambda: {"role": "customer"}
+    app.dependency_overrides[crud_router.use_connection] = no_connection
+    return TestClient(app)
+
+
+def test_export_csv_without_matches(client):
+    """The CSV export of an empty selection is the header of all columns."""
+    response = client.get("/tables/orders/data/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="orders.csv"' in response.headers["content-disposition"]
+    assert response.text == ",".join(COLUMNS) + "\r\n"
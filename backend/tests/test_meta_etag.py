@@ -0,0 +1,110 @@
+# backend/tests/test_meta_etag.py
+
+"""Tests for ETag revalidation of metadata documents."""
+
+import pytest
+from auth.jwt_handler import decode_token
+from database.functions_meta import meta_cache
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import meta_router
+
+
+@pytest.fixture
+def enum_types(monkeypatch):
+    """Enum types returned by the database, editable by the test."""
+    types = ["order_status", "payment_kind"]
+    loads = []
+
+    async def get_enum_types(role):
+        loads.append(role)
+        return list(types)
+
+    monkeypatch.setattr(meta_router, "get_enum_types", get_enum_types)
+    meta_cache.invalidate()
+    yield types, loads
+    meta_cache.invalidate()
+
+
+@pytest.fixture
+def client():
+    """Metadata routes for a token of the customer role."""
+    app = FastAPI()
+    app.include_router(meta_router.meta_router)
+    app.dependency_overrides[decode_token] = lambda: {"role": "customer"}
+    return TestClient(app)
+
+
+def test_document_has_etag(client, enum_types):
+    """Documents carry a strong ETag and must be revalidated."""
+    response = client.get("/enums")
+    assert response.status_code == 200
+    assert response.json() == ["order_status", "payment_kind"]
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    ["{etag}", "W/{etag}", '"stale", {etag}', "*"],
+)
+def test_not_modified(client, enum_types, if_none_match):
+    """A matching If-None-Match gets an empty 304 with the same ETag."""
+    etag = client.get("/enums").headers["ETag"]
+    response = client.get(
+        "/enums", headers={"If-None-Match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_stale_etag(client, enum_types):
+    """A different ETag gets the full document."""
+    response = client.get("/enums", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json() == ["order_status", "payment_kind"]
+
+
+def test_document_cached_until_invalidated(client, enum_types):
+    """The encoded document is reused until the schema changes."""
+    types, loads = enum_types
+    etag = client.get("/enums").headers["ETag"]
+    client.get("/enums")
+    assert loads == ["customer"]
+
+    types.append("refund_reason")
+    meta_cache.invalidate("ALTER TYPE")
+    response = client.get("/enums", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "refund_reason" in response.json()
+
+
+@pytest.fixture
+def enum_labels(monkeypatch):
+    """Labels of the known enum types, unknown types have none."""
+    labels = {"order_status": ["new", "paid"]}
+
+    async def get_enum_labels(role, enum_type):
+        return labels.get(enum_type, [])
+
+    monkeypatch.setattr(meta_router, "get_enum_labels", get_enum_labels)
+    meta_cache.invalidate()
+    yield labels
+    meta_cache.invalidate()
+
+
+def test_enum_labels(client, enum_labels):
+    """Labels of a known enum type are served as a document."""
+    response = client.get("/enums/order_status")
+    assert response.status_code == 200
+    assert response.json() == ["new", "paid"]
+
+
+def test_unknown_enum_not_cached(client, enum_labels):
+    """Unknown enum types get 404 and leave nothing in the cache."""
+    for name in ("nope", "nada", "nichego"):
+        assert client.get(f"/enums/{name}").status_code == 404
+    assert not meta_cache.entries
+    assert not meta_cache._locks
@@ -0,0 +1,45 @@
+# backend/tests/test_pagination.py
+
+"""Tests for keyset pagination cursors."""
+
+import base64
+
+import pytest
+from database.query_builder import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    """A cursor decodes back to the primary key values as strings."""
+    cursor = encode_cursor(
+        {"order_id": 42, "line": 3, "note": "x"}, ["order_id", "line"]
+    )
+    assert decode_cursor(cursor, ["order_id", "line"]) == ["42", "3"]
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    """Cursors travel in query strings without escaping."""
+    cursor = encode_cursor({"id": "ÿÿÿ/+?"}, ["id"])
+    assert "=" not in cursor
+    assert not set(cursor) & set("+/")
+    assert decode_cursor(cursor, ["id"]) == ["ÿÿÿ/+?"]
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", ""])
+def test_malformed_cursor(cursor):
+    """Garbage and non-JSON payloads are rejected."""
+    with pytest.raises(ValueError, match="Malformed cursor"):
+        decode_cursor(cursor, ["id"])
+
+
+def test_cursor_of_another_key():
+    """A cursor with a different number of key values is rejected."""
+    cursor = encode_cursor({"id": 1}, ["id"])
+    with pytest.raises(ValueError, match="does not match"):
+        decode_cursor(cursor, ["order_id", "line"])
+
+
+def test_cursor_not_a_list():
+    """A cursor must encode a JSON array."""
+    cursor = base64.urlsafe_b64encode(b'{"id": 1}').decode().rstrip("=")
+    with pytest.raises(ValueError, match="does not match"):
+        decode_cursor(cursor, ["id"])
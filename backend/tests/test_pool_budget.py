@@ -0,0 +1,247 @@
+# backend/tests/test_pool_budget.py
+
+"""Tests for the connection budget, eviction and sweeping of role pools."""
+
+import asyncio
+
+import pytest
+from config.settings import settings
+from database import connection
+from database.connection import PGPool
+from fastapi import HTTPException
+
+
+class FakePool:
+    """Stand-in for asyncpg.Pool, opening connections lazily up to max_size.
+
+    Like asyncpg, a connection being opened is not counted by get_size()
+    until the connect finishes.
+    """
+
+    def __init__(self, server, min_size: int, max_size: int):
+        self.server = server
+        self.max_size = max_size
+        self.live = min_size
+        self.idle = min_size
+        self.connecting = 0
+        self.closed = False
+        self.waiters = []
+        server.open(min_size)
+
+    def get_size(self):
+        return self.live
+
+    def get_idle_size(self):
+        return self.idle
+
+    def get_max_size(self):
+        return self.max_size
+
+    async def acquire(self):
+        await asyncio.sleep(0)
+        if self.closed:
+            raise RuntimeError("pool is closing")
+        if self.idle:
+            self.idle -= 1
+            return object()
+        if self.live + self.connecting < self.max_size:
+            self.connecting += 1
+            self.server.open(1)
+            await asyncio.sleep(0.01)
+            self.connecting -= 1
+            self.live += 1
+            return object()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        return await waiter
+
+    async def release(self, conn):
+        if self.waiters:
+            self.waiters.pop(0).set_result(conn)
+        else:
+            self.idle += 1
+
+    def expire(self, keep: int):
+        """Close idle connections beyond `keep`, as the idle lifetime would."""
+        closing = min(self.idle, self.live - keep)
+        self.idle -= closing
+        self.live -= closing
+        self.server.connections -= closing
+
+    async def close(self):
+        self.closed = True
+        self.server.connections -= self.live + self.connecting
+
+
+class FakeServer:
+    """Counts connections open across all pools and their peak."""
+
+    def __init__(self):
+        self.connections = 0
+        self.peak = 0
+        self.pools = {}
+
+    def open(self, count: int):
+        self.connections += count
+        self.peak = max(self.peak, self.connections)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Budget of 4 connections, pools of 1 to 15 created on a fake server."""
+    server = FakeServer()
+
+    async def create_pool(dsn, min_size, max_size, **kwargs):
+        pool = FakePool(server, min_size, max_size)
+        pool.lifetime = kwargs["max_inactive_connection_lifetime"]
+        server.pools[dsn.split(":")[1].lstrip("/")] = pool
+        return pool
+
+    monkeypatch.setattr(connection, "create_pool", create_pool)
+    monkeypatch.setattr(settings.database, "pool_budget", 4)
+    monkeypatch.setattr(settings.database, "pool_min_size", 1)
+    monkeypatch.setattr(settings.database, "pool_max_size", 15)
+    return server
+
+
+@pytest.fixture
+def pools():
+    """Registry with two non-default roles logging in as themselves."""
+    registry = PGPool()
+    for role in ("manager", "courier"):
+        registry.register(role, role, "secret")
+    return registry
+
+
+async def use(pools: PGPool, role: str, seconds: float = 0.02):
+    """Hold a connection of the role for a while."""
+    async with pools.checkout(role):
+        await asyncio.sleep(seconds)
+
+
+def test_concurrent_growth_within_budget(server, pools):
+    """Simultaneous callers never open more connections than the budget."""
+
+    async def run():
+        await asyncio.gather(*(use(pools, "manager") for _ in range(10)))
+
+    asyncio.run(run())
+    assert server.peak <= 4
+    assert pools.claims["manager"] <= 4
+    assert pools.reserved == sum(pools.claims.values())
+    assert not pools.lent["manager"] and not pools.held
+
+
+def test_growth_evicts_idle_pool(server, pools):
+    """Growth closes an idle pool of another role to stay within the budget."""
+
+    async def run():
+        await use(pools, "courier", 0)
+        await asyncio.gather(*(use(pools, "manager") for _ in range(10)))
+
+    asyncio.run(run())
+    assert server.pools["courier"].closed
+    assert "courier" not in pools
+    assert server.peak <= 4
+    assert pools.reserved == pools.claims["manager"] == 4
+
+
+def test_pool_held_before_acquire_is_not_evicted(server, pools, monkeypatch):
+    """A pool handed to a caller that has not acquired yet stays open."""
+    monkeypatch.setattr(settings.database, "pool_budget", 2)
+    results = {}
+
+    async def run():
+        await use(pools, "courier", 0)
+        started = asyncio.Event()
+
+        async def hold_manager():
+            async with pools.checkout("manager"):
+                started.set()
+                await asyncio.sleep(0.05)
+
+        async def use_courier():
+            async with pools.checkout("courier"):
+                results["courier"] = True
+
+        async def grow_manager():
+            async with pools.checkout("manager"):
+                results["manager"] = True
+
+        holder = asyncio.create_task(hold_manager())
+        await started.wait()
+        # The courier caller pins its pool before acquiring; the manager
+        # needs budget and must wait instead of evicting it
+        await asyncio.gather(use_courier(), grow_manager())
+        await holder
+
+    asyncio.run(run())
+    assert results == {"courier": True, "manager": True}
+    assert not server.pools["courier"].closed
+    assert server.peak <= 2
+
+
+def test_budget_exhausted(server, pools, monkeypatch):
+    """A new pool is refused with 503 when every pool is in use."""
+    monkeypatch.setattr(settings.database, "pool_budget", 1)
+
+    async def run():
+        async with pools.checkout("manager"):
+            with pytest.raises(HTTPException) as exc:
+                await use(pools, "courier")
+        return exc.value
+
+    assert asyncio.run(run()).status_code == 503
+    assert "courier" not in pools.held
+
+
+def test_sweep_shrinks_claims(server, pools):
+    """Claims of connections closed by the idle lifetime return to the budget."""
+
+    async def run():
+        await asyncio.gather(*(use(pools, "manager") for _ in range(3)))
+        server.pools["manager"].expire(keep=1)
+        await pools.sweep()
+
+    asyncio.run(run())
+    assert pools.claims["manager"] == 1
+    assert pools.reserved == 1
+
+
+def test_sweep_closes_idle_pools(server, pools, monkeypatch):
+    """Pools unused past the idle timeout are closed, default roles are kept."""
+    monkeypatch.setattr(settings.database, "pool_idle_timeout", 0)
+    monkeypatch.setitem(
+        settings.database.default_roles,
+        "manager",
+        settings.database.get_role("endpoint"),
+    )
+
+    async def run():
+        await use(pools, "manager", 0)
+        await use(pools, "courier", 0)
+        await asyncio.sleep(0.01)
+        await pools.sweep()
+
+    asyncio.run(run())
+    assert "manager" in pools
+    assert "courier" not in pools
+    assert pools.reserved == 1
+
+
+def test_prewarmed_pools_stay_warm(server, pools, monkeypatch):
+    """Pre-warmed pools keep their connections and are never swept."""
+    monkeypatch.setattr(settings.database, "pool_idle_timeout", 0)
+
+    async def run():
+        await pools.prewarm(["manager"], 3)
+        await use(pools, "courier", 0)
+        await asyncio.sleep(0.01)
+        await pools.sweep()
+
+    asyncio.run(run())
+    assert server.pools["manager"].lifetime == 0
+    assert server.pools["manager"].get_size() == 3
+    assert server.pools["courier"].lifetime == settings.database.pool_conn_lifetime
+    assert "manager" in pools
+    assert "courier" not in pools
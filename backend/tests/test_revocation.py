@@ -0,0 +1,132 @@
+# backend/tests/test_revocation.py
+
+"""Tests for the revoked token denylist."""
+
+import asyncio
+import time
+
+import pytest
+from auth import revocation
+from auth.jwt_handler import JWTType, decode_token, encode_token
+from auth.revocation import Denylist, denylist
+from fastapi import HTTPException
+from jose import jwt
+
+
+def test_add_and_contains():
+    """Added ids are denied, unknown ids and missing jti are not."""
+    revoked = Denylist()
+    revoked.add("a", time.time() + 60)
+    assert "a" in revoked
+    assert "b" not in revoked
+    assert None not in revoked
+
+
+def test_prune_drops_expired():
+    """Entries past their expiry are dropped by the periodic prune."""
+    revoked = Denylist()
+    revoked.revoked = {"old": time.time() - 1, "live": time.time() + 60}
+    revoked.add("new", time.time() + 60)
+    assert set(revoked.revoked) == {"old", "live", "new"}
+    revoked.prune()
+    assert set(revoked.revoked) == {"live", "new"}
+
+
+def test_pruner_runs_periodically(monkeypatch):
+    """The background pruner drops expired entries until stopped."""
+    monkeypatch.setattr(revocation, "PRUNE_INTERVAL", 0)
+    revoked = Denylist()
+    revoked.revoked = {"old": time.time() - 1}
+
+    async def run():
+        revoked.start_pruner()
+        await asyncio.sleep(0.01)
+        revoked.stop_pruner()
+
+    asyncio.run(run())
+    assert not revoked.revoked
+    assert revoked._pruner is None
+
+
+def test_on_notify():
+    """Notifications carry 'jti exp' from other workers."""
+    revoked = Denylist()
+    revoked.on_notify("abc 4102444800")
+    assert revoked.revoked == {"abc": 4102444800.0}
+
+
+def test_on_notify_reconnect_reloads(monkeypatch):
+    """A None payload after reconnect reloads the denylist from the database."""
+    revoked = Denylist()
+
+    async def load():
+        revoked.revoked = {"missed": time.time() + 60}
+
+    monkeypatch.setattr(revoked, "load", load)
+
+    async def run():
+        revoked.on_notify(None)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert "missed" in revoked
+
+
+def test_reload_keeps_entries_on_failure(monkeypatch):
+    """A failed reload keeps the entries already known."""
+    revoked = Denylist()
+    revoked.add("a", time.time() + 60)
+
+    async def load():
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(revoked, "load", load)
+    asyncio.run(revoked.reload())
+    assert "a" in revoked
+
+
+@pytest.fixture
+def revoked_ids(monkeypatch):
+    """Isolate the shared denylist from other tests."""
+    monkeypatch.setattr(denylist, "revoked", {})
+    return denylist
+
+
+def test_revoked_token_rejected(revoked_ids):
+    """A token is refused once its jti is revoked, even if already verified."""
+
+    async def run():
+        token = await encode_token("alice", "customer", JWTType.AT)
+        payload = await decode_token(token)
+        revoked_ids.add(payload["jti"], payload["exp"])
+        with pytest.raises(HTTPException) as exc:
+            await decode_token(token)
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 401
+    assert error.detail == "Token has been revoked"
+
+
+def test_tokens_get_distinct_jti():
+    """Every issued token has its own id, so revoking one spares the others."""
+
+    async def run():
+        return [await encode_token("alice", "customer", JWTType.AT) for _ in range(2)]
+
+    tokens = asyncio.run(run())
+    claims = [jwt.get_unverified_claims(token) for token in tokens]
+    assert claims[0]["jti"] != claims[1]["jti"]
+
+
+def test_revoke_is_effective_at_once(monkeypatch, revoked_ids):
+    """revoke() denies the id locally before recording it."""
+    statements = []
+
+    async def execute(query, role, mode, params=None):
+        assert "a" in revoked_ids
+        statements.append((role, params))
+
+    monkeypatch.setattr(revocation, "execute", execute)
+    asyncio.run(revocation.revoke("a", 4102444800.0))
+    assert statements == [(revocation.REVOCATION_ROLE, ("a", 4102444800.0))]
@@ -0,0 +1,144 @@
+# backend/tests/test_serialization.py
+
+"""Tests for JSON encoding of database values."""
+
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from ipaddress import ip_address, ip_interface, ip_network
+from uuid import UUID
+
+import pytest
+from asyncpg import BitString, Range
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from utils import serialization
+from utils.serialization import dump_json, json_default
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (Decimal("12.50"), "12.50"),
+        (UUID(int=1), "00000000-0000-0000-0000-000000000001"),
+        (datetime(2015, 1, 1, 10, tzinfo=timezone.utc), "2015-01-01T10:00:00Z"),
+        (datetime(2015, 1, 1, 10), "2015-01-01T10:00:00"),
+        (date(2015, 1, 1), "2015-01-01"),
+        (b"abc", "abc"),
+        (ip_address("10.0.0.1"), "10.0.0.1"),
+        (ip_address("::1"), "::1"),
+        (ip_interface("10.0.0.1/24"), "10.0.0.1/24"),
+        (ip_network("10.0.0.0/8"), "10.0.0.0/8"),
+        (BitString("101"), "101"),
+    ],
+)
+def test_json_default(value, expected):
+    """Values without a JSON form are encoded as text."""
+    assert json_default(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        timedelta(0),
+        timedelta(days=1, hours=2),
+        timedelta(seconds=90.5),
+        timedelta(microseconds=1),
+        -timedelta(hours=1),
+        -timedelta(days=1, seconds=1),
+    ],
+)
+def test_timedelta_as_pydantic(value):
+    """Durations are ISO 8601, the same text the model path produced."""
+    expected = json.loads(TypeAdapter(timedelta).dump_json(value))
+    assert json_default(value) == expected
+
+
+def test_range():
+    """Ranges keep their bounds and inclusivity."""
+    assert json_default(Range(1, 5)) == {
+        "lower": 1,
+        "upper": 5,
+        "lower_inc": True,
+        "upper_inc": False,
+        "empty": False,
+    }
+
+
+def test_unknown_type_as_text():
+    """Anything else falls back to its text instead of failing the response."""
+
+    class Point:
+        def __str__(self):
+            return "(1,2)"
+
+    assert json_default(Point()) == "(1,2)"
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_json(monkeypatch, use_orjson):
+    """Both encoders produce the same document."""
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    row = {
+        "id": UUID(int=1),
+        "total": Decimal("1.5"),
+        "span": Range(date(2015, 1, 1), date(2015, 2, 1)),
+        "at": datetime(2015, 1, 1, tzinfo=timezone.utc),
+    }
+    assert json.loads(dump_json(row)) == {
+        "id": "00000000-0000-0000-0000-000000000001",
+        "total": "1.5",
+        "span": {
+            "lower": "2015-01-01",
+            "upper": "2015-02-01",
+            "lower_inc": True,
+            "upper_inc": False,
+            "empty": False,
+        },
+        "at": "2015-01-01T00:00:00Z",
+    }
+
+
+@pytest.mark.parametrize("col_type", ["timestamp", "timestamp without time zone"])
+def test_timestamp_column_naive_utc(col_type):
+    """Offsets sent for timestamp columns are normalised to naive UTC."""
+    coercer = serialization.Coercer({"at": col_type})
+    record = coercer.coerce({"at": "2015-01-01T10:00:00+03:00"})
+    assert record["at"] == datetime(2015, 1, 1, 7)
+    assert record["at"].tzinfo is None
+
+
+@pytest.mark.parametrize("col_type", ["timestamptz", "timestamp with time zone"])
+def test_timestamptz_column_keeps_offset(col_type):
+    """Timestamps for timestamptz columns stay aware, at the instant sent."""
+    coercer = serialization.Coercer({"at": col_type})
+    record = coercer.coerce({"at": "2015-01-01T10:00:00+03:00"})
+    assert record["at"] == datetime(2015, 1, 1, 7, tzinfo=timezone.utc)
+    assert record["at"].utcoffset() == timedelta(hours=3)
+
+
+def test_to_datetime_normalises_offsets():
+    """Timestamps with an offset become naive UTC."""
+    assert serialization.to_datetime("at", "2015-01-01T10:00:00+03:00") == datetime(
+        2015, 1, 1, 7
+    )
+    assert serialization.to_datetime("at", "2015-01-01T10:00:00Z") == datetime(
+        2015, 1, 1, 10
+    )
+    assert serialization.to_datetime("at", "2015-01-01") == datetime(2015, 1, 1)
+
+
+def test_to_date_keeps_calendar_date():
+    """Dates keep the day written, whatever the offset."""
+    assert serialization.to_date("on", "2015-01-01T01:00:00+03:00") == date(2015, 1, 1)
+
+
+def test_to_datetime_rejects_other_formats():
+    """Non ISO-8601 input is a 400 naming the expected format."""
+    with pytest.raises(HTTPException) as exc:
+        serialization.to_datetime("at", "01/01/2015")
+    assert exc.value.status_code == 400
+    assert "ISO-8601" in exc.value.detail
@@ -0,0 +1,92 @@
+# backend/tests/test_statements.py
+
+"""Tests for the canonical unnest statements of bulk CRUD operations."""
+
+import asyncio
+
+import pytest
+from database.query_builder import (
+    CRUD,
+    CRUDQueries,
+    build_gen_many,
+    build_trim_many,
+    build_upd_many,
+)
+
+
+@pytest.fixture
+def queries():
+    """Cached templates of a table keyed by (order_id, line)."""
+    return {
+        "gen_many": CRUDQueries.INSERT,
+        "list_many": CRUDQueries.SELECT,
+        "trim_many": CRUDQueries.DELETE,
+        "upd_many": CRUDQueries.UPDATE,
+        "columns": ["order_id", "line", "qty", "note"],
+        "pk_cols": ["order_id", "line"],
+        "set_cols": ["qty", "note"],
+        "column_types": {
+            "order_id": "int4",
+            "line": "int2",
+            "qty": "numeric",
+            "note": "text",
+        },
+    }
+
+
+def test_gen_many(queries):
+    """Inserts bind one typed array per column."""
+    assert build_gen_many("order_line", ["qty", "note"], queries) == (
+        'INSERT INTO pi.order_line ("qty", "note") '
+        "SELECT * FROM unnest($1::numeric[], $2::text[]) RETURNING *;"
+    )
+
+
+def test_trim_many(queries):
+    """Deletes join the table to the unnested keys."""
+    assert build_trim_many("order_line", ["order_id", "line"], queries) == (
+        "DELETE FROM pi.order_line "
+        "USING unnest($1::int4[], $2::int2[]) AS cte "
+        '("order_id", "line") '
+        'WHERE order_line."order_id" = cte."order_id" '
+        'AND order_line."line" = cte."line" '
+        "RETURNING order_line.*;"
+    )
+
+
+def test_upd_many(queries):
+    """Updates set the non-key columns and join on the keys listed first."""
+    columns = ["order_id", "line", "qty"]
+    assert build_upd_many("order_line", columns, queries) == (
+        'UPDATE pi.order_line SET "qty" = cte."qty" '
+        "FROM unnest($1::int4[], $2::int2[], $3::numeric[]) AS cte "
+        '("order_id", "line", "qty") '
+        'WHERE order_line."order_id" = cte."order_id" '
+        'AND order_line."line" = cte."line" '
+        "RETURNING order_line.*;"
+    )
+
+
+def test_statement_cached_per_shape(queries):
+    """Statements are rendered once per role, table, operation and columns."""
+    crud = CRUD()
+    calls = []
+
+    async def get_queries(role, table):
+        calls.append((role, table))
+        return queries
+
+    crud.get_queries = get_queries
+
+    async def run():
+        first = await crud.get_statement("endpoint", "order_line", "gen_many", ["qty"])
+        again = await crud.get_statement("endpoint", "order_line", "gen_many", ["qty"])
+        other = await crud.get_statement(
+            "endpoint", "order_line", "gen_many", ["qty", "note"]
+        )
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert first is again
+    assert first != other
+    assert len(calls) == 2
@@ -0,0 +1,155 @@
+# backend/tests/test_static.py
+
+"""Tests for cache headers and precompressed variants of static assets."""
+
+import gzip
+
+import pytest
+from config.settings import settings
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes.spa_router import spa_router
+from utils.static import (
+    HASHED_ASSET,
+    IMMUTABLE,
+    REVALIDATE,
+    CachedStaticFiles,
+    accepted_encodings,
+    etag_matches,
+)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", set()),
+        ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+        ("br;q=1.0, gzip;q=0.5", {"br", "gzip"}),
+        ("br;q=0, gzip", {"gzip"}),
+        ("GZIP", {"gzip"}),
+        ("br;q=x, gzip", {"gzip"}),
+    ],
+)
+def test_accepted_encodings(header, expected):
+    """Encodings refused with q=0 or an invalid weight are left out."""
+    assert accepted_encodings(header) == expected
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"x", "abc"', True),
+        ("*", True),
+        ('"abcd"', False),
+        ('"ab"', False),
+        ("abc", False),
+    ],
+)
+def test_etag_matches(header, expected):
+    """Listed, weak and wildcard tags match, substrings do not."""
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "assets/index-B3xk9Qa1.js",
+        "assets/vendor-vue-a_B-1234.css",
+        "sub/assets/logo-AbCdEfGh.svg",
+    ],
+)
+def test_hashed_asset(path):
+    """Vite output named [name]-[hash].[ext] under assets/ is hashed."""
+    assert HASHED_ASSET.search(path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "apple-touch-icon.png",
+        "assets/apple-touch-icon.png",
+        "favicon.ico",
+        "index.html",
+        "assets/index-B3xk9Qa12.js",
+        "img/logo-abcdefgh.png",
+    ],
+)
+def test_unhashed_asset(path):
+    """Other names, including hyphenated ones, are not hashed."""
+    assert not HASHED_ASSET.search(path)
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Static files with a hashed script, its gzip variant and an icon."""
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    script = b"console.log('hello');" * 20
+    (assets / "index-B3xk9Qa1.js").write_bytes(script)
+    (assets / "index-B3xk9Qa1.js.gz").write_bytes(gzip.compress(script))
+    (tmp_path / "apple-touch-icon.png").write_bytes(b"png")
+    app = FastAPI()
+    app.mount("/static", CachedStaticFiles(directory=str(tmp_path)))
+    return TestClient(app)
+
+
+def test_precompressed_variant(client):
+    """An accepted precompressed variant is served with the original type."""
+    response = client.get(
+        "/static/assets/index-B3xk9Qa1.js", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Content-Type"].startswith("text/javascript")
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.content == b"console.log('hello');" * 20
+
+
+def test_identity_when_refused(client):
+    """Without an accepted encoding the original file is served."""
+    response = client.get(
+        "/static/assets/index-B3xk9Qa1.js", headers={"Accept-Encoding": "identity"}
+    )
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+
+def test_unhashed_file_revalidates(client):
+    """Files without a content hash must be revalidated."""
+    response = client.get("/static/apple-touch-icon.png")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == REVALIDATE
+    assert "Vary" not in response.headers
+
+
+@pytest.fixture
+def spa(tmp_path, monkeypatch):
+    """SPA route serving an index.html from a temporary front directory."""
+    (tmp_path / "index.html").write_bytes(b"<html></html>")
+    monkeypatch.setattr(settings, "front_res_path", tmp_path)
+    app = FastAPI()
+    app.include_router(spa_router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "if_none_match, status",
+    [
+        ("{etag}", 304),
+        ("W/{etag}", 304),
+        ('"stale", {etag}', 304),
+        ("*", 304),
+        ('"stale"', 200),
+        ("{etag}x", 200),
+    ],
+)
+def test_spa_revalidation(spa, if_none_match, status):
+    """The shell is revalidated with the same If-None-Match rules as documents."""
+    headers = {"Accept-Encoding": "identity"}
+    etag = spa.get("/", headers=headers).headers["ETag"]
+    headers["If-None-Match"] = if_none_match.format(etag=etag)
+    assert spa.get("/", headers=headers).status_code == status
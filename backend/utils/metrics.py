@@ -0,0 +1,157 @@
+# backend/utils/metrics.py
+
+"""In-process metric primitives aggregated without any I/O."""
+
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""Upper bounds in seconds of the latency histogram buckets."""
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, in seconds."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+Sample = Tuple[str, Dict[str, str], float]
+"""Gauge sample as (name, labels, value)."""
+
+
+def escape_label(value) -> str:
+    """Escape a label value for Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    """Render labels in Prometheus text format."""
+    pairs = ",".join(f'{k}="{escape_label(v)}"' for k, v in labels)
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Metrics:
+    """Registry of labelled histograms, counters and gauge collectors."""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[Tuple, Histogram]] = defaultdict(dict)
+        self.counters: Dict[str, Dict[Tuple, float]] = defaultdict(dict)
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Record an observation into the histogram of a name and label set."""
+        key = tuple(sorted(labels.items()))
+        series = self.histograms[name]
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """Increase the counter of a name and label set."""
+        key = tuple(sorted(labels.items()))
+        series = self.counters[name]
+        series[key] = series.get(key, 0) + amount
+
+    def register(self, collector: Callable[[], Iterable[Sample]]):
+        """Add a callable sampling gauges at render time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        lines = []
+        gauges: Dict[str, List[Tuple[Dict[str, str], float]]] = defaultdict(list)
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                gauges[name].append((labels, value))
+        for name, samples in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(sorted(labels.items()))} {value}")
+        for name, series in list(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in list(series.items()):
+                lines.append(f"{name}{format_labels(key)} {value}")
+        for name, series in list(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in list(series.items()):
+                cumulative = 0
+                bounds = [*map(str, hist.buckets), "+Inf"]
+                for bound, count in zip(bounds, hist.counts):
+                    cumulative += count
+                    labels = format_labels((*key, ("le", bound)))
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(key)} {hist.sum}")
+                lines.append(f"{name}_count{format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+"""Shared metrics registry of the application."""
+
+
+@contextmanager
+def timed(phases: Dict[str, float], phase: str):
+    """Add the duration of the block in seconds to `phases[phase]`."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = phases.get(phase, 0.0) + perf_counter() - started
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware recording request latency per matched route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep the label set bounded, unlike raw paths
+            route = scope.get("route")
+            metrics.observe(
+                "http_request_duration_seconds",
+                perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
@@ -1,13 +1,51 @@
 # backend/utils/serialization.py
 
+import csv
+import hashlib
+import io
 import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from ipaddress import (
+    IPv4Address,
+    IPv4Interface,
+    IPv4Network,
+    IPv6Address,
+    IPv6Interface,
+    IPv6Network,
+)
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+from uuid import UUID
 
-from config.logging import logger
-from database.functions_meta import get_cached_schema
+from asyncpg import BitString, Range
+from database.functions_meta import get_cached_schema, meta_cache
 from fastapi import HTTPException
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json is the fallback
+    orjson = None
+
+IP_TYPES = (
+    IPv4Address,
+    IPv6Address,
+    IPv4Interface,
+    IPv6Interface,
+    IPv4Network,
+    IPv6Network,
+)
+"""Address types asyncpg returns for inet and cidr columns."""
+
 
 async def validate_column_names(
     role: str, table: str, col_names: List[str], keys_only: bool = False
@@ -90,83 +128,266 @@ async def parse_and_validate_filters(
     return parsed
 
 
+def parse_iso(key: str, value: str) -> datetime:
+    """Parse an ISO-8601 date or timestamp string."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid date format for {key}: {value}. Expected an ISO-8601 date or timestamp (e.g., '2015-01-01T10:00:00' or '2015-01-01')",
+        )
+
+
+def to_datetime(key: str, value: str) -> datetime:
+    """Parse an ISO-8601 timestamp without time zone, offsets moved to UTC."""
+    parsed = parse_iso(key, value)
+    if parsed.tzinfo is not None:
+        # asyncpg не принимает aware-значения для timestamp без зоны
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def to_timestamptz(key: str, value: str) -> datetime:
+    """Parse an ISO-8601 timestamp with time zone, keeping its offset."""
+    # Наивное значение asyncpg прочитал бы как локальное время хоста
+    return parse_iso(key, value)
+
+
+def to_date(key: str, value: str) -> date:
+    """Parse an ISO-8601 date or timestamp string into its calendar date."""
+    return parse_iso(key, value).date()
+
+
+def to_int(key: str, value: str) -> int:
+    """Parse an integer string."""
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid integer format for {key}: {value}. Expected an integer.",
+        )
+
+
+def to_float(key: str, value: str) -> float:
+    """Parse a numeric string."""
+    try:
+        return float(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid numeric format for {key}: {value}. Expected a number.",
+        )
+
+
+def to_bool(key: str, value: str) -> bool:
+    """Parse a 'true' or 'false' string."""
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid boolean format for {key}: {value}. Expected 'true' or 'false'.",
+    )
+
+
+def to_json(key: str, value: str) -> Any:
+    """Parse a JSON document string."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid JSON format for {key}: {value}. Expected valid JSON.",
+        )
+
+
+CONVERTERS: Dict[str, Callable[[str, str], Any]] = {
+    "date": to_date,
+    **dict.fromkeys(["timestamp", "timestamp without time zone"], to_datetime),
+    **dict.fromkeys(["timestamptz", "timestamp with time zone"], to_timestamptz),
+    **dict.fromkeys(["integer", "int", "int4"], to_int),
+    **dict.fromkeys(["numeric", "decimal"], to_float),
+    "boolean": to_bool,
+    **dict.fromkeys(["json", "jsonb"], to_json),
+}
+"""Maps PostgreSQL column types to converters of string values."""
+
+
+class Coercer:
+    """Converts string values of a table's records to their column types."""
+
+    def __init__(self, column_types: Dict[str, str]):
+        """Resolve a converter per column once; other columns pass through."""
+        self.converters = {
+            col: CONVERTERS[col_type.lower()]
+            for col, col_type in column_types.items()
+            if col_type.lower() in CONVERTERS
+        }
+
+    def coerce(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert one record."""
+        transformed = values.copy()
+        converters = self.converters
+        for key, value in values.items():
+            if isinstance(value, str) and key in converters:
+                transformed[key] = converters[key](key, value)
+        return transformed
+
+    def coerce_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert a batch of records."""
+        coerce = self.coerce
+        return [coerce(values) for values in records]
+
+
+@meta_cache.cached
+async def get_coercer(role: str, table: str) -> Coercer:
+    """Build and cache the coercer of a table for the current schema version."""
+    schema = await get_cached_schema(role, table)
+    return Coercer({col["column_name"]: col["data_type"] for col in schema})
+
+
 async def transform_values_types(
     role: str, table: str, parsed: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Transform string values to appropriate types based on column types."""
-    schema = await get_cached_schema(role, table)
-    column_types = {col["column_name"]: col["data_type"] for col in schema}
+    return (await get_coercer(role, table)).coerce(parsed)
 
-    transformed = parsed.copy()
 
-    date_formats = [
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d",
-    ]
+async def stream_ndjson(
+    records: AsyncIterator[Mapping[str, Any]],
+    columns: Sequence[str],
+    chunk_rows: int = 500,
+) -> AsyncIterator[bytes]:
+    """Encode streamed records as newline-delimited JSON, in chunks of rows."""
+    lines = []
+    async for record in records:
+        # Значения кодируются так же, как в JSON-ответах API
+        lines.append(dump_json(dict(zip(columns, record.values()))))
+        if len(lines) >= chunk_rows:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
 
-    for key, value in transformed.items():
-        if key not in column_types:
-            continue
 
-        col_type = column_types[key].lower()
+def csv_cell(value: Any) -> Any:
+    """Format a value for CSV the way the JSON encoders write it."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (dict, list)):
+        return dump_json(value).decode()
+    encoded = json_default(value)
+    return encoded if isinstance(encoded, str) else dump_json(encoded).decode()
 
-        if isinstance(value, str):
-            if col_type in (
-                "date",
-                "timestamp",
-                "timestamptz",
-                "timestamp with time zone",
-                "timestamp without time zone",
-            ):
-                for date_format in date_formats:
-                    try:
-                        dt = datetime.strptime(value, date_format)
-                        if col_type == "date":
-                            transformed[key] = dt.date()
-                        else:
-                            transformed[key] = dt
-                        logger.info(
-                            f"Transformed {key} from {value} to {transformed[key]} (type: {col_type})"
-                        )
-                        break
-                    except ValueError:
-                        continue
-                else:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid date format for {key}: {value}. Expected one of {date_formats} (e.g., '2015-01-01T10:00:00' or '2015-01-01')",
-                    )
-            elif col_type in ("integer", "int", "int4"):
-                try:
-                    transformed[key] = int(value)
-                except ValueError:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid integer format for {key}: {value}. Expected an integer.",
-                    )
-            elif col_type in ("numeric", "decimal"):
-                try:
-                    transformed[key] = float(value)
-                except ValueError:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid numeric format for {key}: {value}. Expected a number.",
-                    )
-            elif col_type == "boolean":
-                if value.lower() in ("true", "false"):
-                    transformed[key] = value.lower() == "true"
-                else:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid boolean format for {key}: {value}. Expected 'true' or 'false'.",
-                    )
-            elif col_type in ("json", "jsonb"):
-                try:
-                    transformed[key] = json.loads(value)
-                except json.JSONDecodeError:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid JSON format for {key}: {value}. Expected valid JSON.",
-                    )
-
-    return transformed
+
+async def stream_csv(
+    records: AsyncIterator[Mapping[str, Any]],
+    columns: Sequence[str],
+    chunk_rows: int = 500,
+) -> AsyncIterator[bytes]:
+    """Encode streamed records as CSV with a header row, in chunks of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Заголовок пишется и при пустой выборке
+    writer.writerow(columns)
+    rows = 0
+    async for record in records:
+        writer.writerow([csv_cell(value) for value in record.values()])
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iso_duration(value: timedelta) -> str:
+    """Format a timedelta as an ISO 8601 duration, e.g. P1DT2H30M."""
+    sign = "-" if value < timedelta(0) else ""
+    value = abs(value)
+    minutes, seconds = divmod(value.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    clock = "".join(f"{n}{unit}" for n, unit in ((hours, "H"), (minutes, "M")) if n)
+    if value.microseconds:
+        clock += f"{seconds}.{value.microseconds:06d}".rstrip("0") + "S"
+    elif seconds:
+        clock += f"{seconds}S"
+    days = f"{value.days}D" if value.days else ""
+    if not days and not clock:
+        return "PT0S"
+    return f"{sign}P{days}" + (f"T{clock}" if clock else "")
+
+
+def json_default(value: Any) -> Any:
+    """Encode values the JSON encoders do not handle, as pydantic would."""
+    if isinstance(value, (Decimal, UUID, *IP_TYPES)):
+        return str(value)
+    if isinstance(value, (datetime, date, time)):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, timedelta):
+        return iso_duration(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, Range):
+        return {
+            "lower": value.lower,
+            "upper": value.upper,
+            "lower_inc": value.lower_inc,
+            "upper_inc": value.upper_inc,
+            "empty": value.isempty,
+        }
+    if isinstance(value, BitString):
+        return value.as_string()
+    # Прочие типы asyncpg (геометрия, bit string и т.п.) отдаём текстом
+    return str(value)
+
+
+def dump_json(obj: Any) -> bytes:
+    """Serialize an object to JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        obj, default=json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class JSONDocument(NamedTuple):
+    """Encoded JSON body with the strong ETag of its content."""
+
+    body: bytes
+    etag: str
+
+
+def to_document(obj: Any) -> JSONDocument:
+    """Encode an object once and hash the bytes into an ETag."""
+    body = dump_json(obj)
+    return JSONDocument(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+
+def dump_keyed(
+    records: Sequence[Mapping[str, Any]], pk_cols: List[str], **extra: Any
+) -> bytes:
+    """Serialize rows straight to `{records: [{keys, data}]}` JSON bytes.
+
+    The key/data split is resolved once from the first row's columns and then
+    applied by position, skipping intermediate dicts and model validation.
+    """
+    rows = []
+    if records:
+        names = list(records[0].keys())
+        key_idx = [(col, names.index(col)) for col in pk_cols]
+        data_idx = [(col, i) for i, col in enumerate(names) if col not in pk_cols]
+        rows = [
+            {
+                "keys": {col: r[i] for col, i in key_idx},
+                "data": {col: r[i] for col, i in data_idx},
+            }
+            for r in records
+        ]
+    return dump_json({"records": rows, **extra})
@@ -0,0 +1,117 @@
+# backend/utils/static.py
+
+"""Serves built frontend assets with cache headers and precompressed variants."""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, NamedTuple, Set
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+"""Content encodings by preference with the suffix of their precompressed file."""
+
+HASHED_ASSET = re.compile(r"(?:^|/)assets/[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+"""Matches Vite output assets/[name]-[hash].[ext], e.g. assets/index-B3xk9Qa1.js."""
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Parse Accept-Encoding into the encodings not refused with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        q = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            weight = float(q)
+        except ValueError:
+            weight = 0
+        if coding and weight > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Check If-None-Match against an ETag, weakly as required for GET."""
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags or "*" in tags
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles adding Cache-Control and serving .br/.gz files when accepted.
+
+    Precompressed siblings are indexed once at startup, so a rebuild of the
+    frontend needs a restart to pick up new variants.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.variants: Dict[str, Set[str]] = {}
+        for root, _, files in os.walk(str(self.directory)):
+            for name in files:
+                for encoding, suffix in ENCODINGS:
+                    if name.endswith(suffix):
+                        rel = os.path.relpath(os.path.join(root, name), self.directory)
+                        self.variants.setdefault(rel[: -len(suffix)], set()).add(
+                            encoding
+                        )
+
+    async def get_response(self, path: str, scope) -> Response:
+        variants = self.variants.get(path)
+        if variants:
+            accepted = accepted_encodings(
+                Headers(scope=scope).get("accept-encoding", "")
+            )
+            for encoding, suffix in ENCODINGS:
+                if encoding not in variants or encoding not in accepted:
+                    continue
+                try:
+                    response = await super().get_response(path + suffix, scope)
+                except HTTPException:
+                    continue
+                response.headers["Content-Encoding"] = encoding
+                # Тип берём от исходного файла, а не от .br/.gz
+                media_type = mimetypes.guess_type(path)[0] or "text/plain"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                response.headers["Content-Type"] = media_type
+                return self.with_cache_headers(path, response, variants)
+        response = await super().get_response(path, scope)
+        return self.with_cache_headers(path, response, variants)
+
+    @staticmethod
+    def with_cache_headers(path: str, response: Response, variants) -> Response:
+        """Mark hashed assets immutable and everything else for revalidation."""
+        if response.status_code in (200, 304):
+            immutable = HASHED_ASSET.search(path)
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+        if variants:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class SPAShell(NamedTuple):
+    """index.html held in memory with its gzip encoding and their ETags."""
+
+    body: bytes
+    etag: str
+    gzipped: bytes
+    gzipped_etag: str
+
+
+@lru_cache(maxsize=1)
+def load_shell(path: Path) -> SPAShell:
+    """Read and compress the SPA shell once per process."""
+    body = path.read_bytes()
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return SPAShell(body, f'"{digest}"', gzip.compress(body), f'"{digest}-gzip"')
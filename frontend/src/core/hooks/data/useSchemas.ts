@@ -2,12 +2,29 @@
 
 import { api } from "@/core/services/api";
 
+// One bundle request per table serves the base schema and every view
+const BUNDLE_TTL = 1000 * 30;
+const bundles = new Map<string, { at: number; request: Promise<any> }>();
+
+const getBundle = (table: string) => {
+	const entry = bundles.get(table);
+	if (entry && Date.now() - entry.at < BUNDLE_TTL) return entry.request;
+	const request = api.getSchemaBundle(table).catch((e) => {
+		bundles.delete(table);
+		throw e;
+	});
+	bundles.set(table, { at: Date.now(), request });
+	return request;
+};
+
+// Callers augment schemas in place, so each gets its own copy
+const fromBundle = async (table: string, part: string) =>
+	structuredClone((await getBundle(table))[part]);
+
 export const useSchemas = () => ({
 	getTables: api.getTables,
 	getSchemas: api.getSchemas,
-	getSchema: api.getSchema,
+	getSchema: (table: string) => fromBundle(table, "base"),
 	getSchemaView: (table: string, view = "WizardView") =>
-		view === "WizardView"
-			? api.getWizardSchemaView(table)
-			: api.getSimpleSchemaView(table, view),
+		fromBundle(table, view),
 });
@@ -33,6 +33,8 @@ export const api = {
 	getSimpleSchemaView: (table, schemaView) =>
 		client.get(`/api/tables/${table}/schema/${schemaView}`),
 	getSchemas: () => client.get("/api/tables/schemas"),
+	getSchemaBundle: (table) => client.get(`/api/tables/${table}/schema/bundle`),
+	getSchemaBundles: () => client.get("/api/tables/schemas/bundle"),
 	getBackRefs: (table: string) => client.get(`/api/tables/${table}/refs`),
 	genMany: (table, data_only_list) =>
 		client.post(`/api/tables/${table}/data/bulk`, { records: data_only_list }),